@@ -0,0 +1,171 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import AsyncIterator, Callable
+
+import pandas as pd
+
+from straw.reader import TabularDataReader
+from straw.settings import Default as DefaultSettings
+
+
+def _is_async_stream(source) -> bool:
+	return hasattr(source, '__aiter__') or asyncio.iscoroutinefunction(getattr(source, 'read', None))
+
+
+async def _read_async_stream(source, size: int) -> bytes:
+	if hasattr(source, 'read'):
+		return await source.read(size)
+	try:
+		return await anext(source)
+	except StopAsyncIteration:
+		return b''
+
+
+class AsyncStreamBridge(io.RawIOBase):
+	# Blocking file object over an async stream, for a parser running on a worker thread.
+	def __init__(self, source, loop: asyncio.AbstractEventLoop):
+		self.source = source.__aiter__() if not hasattr(source, 'read') else source
+		self.loop = loop
+		self.pending = b''
+
+	def readable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		if not self.pending:
+			self.pending = asyncio.run_coroutine_threadsafe(
+				_read_async_stream(self.source, len(buffer)), self.loop).result()
+		size = min(len(buffer), len(self.pending))
+		buffer[:size] = self.pending[:size]
+		self.pending = self.pending[size:]
+		return size
+
+
+class AsyncTabularDataReader:
+	# Parsing runs on the executor, at most max_concurrency reads at a time. A cancelled read that
+	# already started keeps its slot until the worker finishes.
+	def __init__(
+			self,
+			reader: TabularDataReader,
+			executor: Executor | None = None,
+			max_concurrency: int = DefaultSettings.ASYNC_MAX_CONCURRENCY
+	):
+		self.reader = reader
+		self.executor = executor
+		self.max_concurrency = max_concurrency
+		self.semaphore = asyncio.Semaphore(max_concurrency)
+		self._thread_executor: ThreadPoolExecutor | None = None
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *args):
+		self.close()
+
+	def close(self):
+		if self._thread_executor is not None:
+			self._thread_executor.shutdown(wait=False, cancel_futures=True)
+			self._thread_executor = None
+
+	def _get_thread_executor(self) -> ThreadPoolExecutor:
+		if isinstance(self.executor, ThreadPoolExecutor):
+			return self.executor
+		if self._thread_executor is None:
+			self._thread_executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+		return self._thread_executor
+
+	async def _submit(self, executor: Executor, func: Callable, *args) -> asyncio.Future:
+		await self.semaphore.acquire()
+		loop = asyncio.get_running_loop()
+		try:
+			future = executor.submit(func, *args)
+		except BaseException:
+			self.semaphore.release()
+			raise
+		future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.semaphore.release))
+		return asyncio.wrap_future(future)
+
+	async def _run(self, executor: Executor, func: Callable, *args):
+		return await (await self._submit(executor, func, *args))
+
+	@staticmethod
+	async def _read_source(source):
+		# Async inputs are read on the event loop, the parser gets them as a buffer.
+		if isinstance(source, (bytes, bytearray, memoryview)):
+			return io.BytesIO(source)
+		if not _is_async_stream(source):
+			return source
+		blocks = list[bytes]()
+		if hasattr(source, 'read'):
+			while block := await source.read(DefaultSettings.ASYNC_READ_SIZE):
+				blocks.append(block)
+		else:
+			async for block in source:
+				blocks.append(block)
+		return io.BytesIO(b''.join(blocks))
+
+	def _get_executor(self, source) -> Executor:
+		# Open file objects can not be sent to another process.
+		if self.executor is not None and isinstance(source, (str, os.PathLike, io.BytesIO)):
+			return self.executor
+		return self._get_thread_executor()
+
+	async def aread_csv(self, filepath_or_buffer) -> pd.DataFrame:
+		source = await self._read_source(filepath_or_buffer)
+		return await self._run(self._get_executor(source), self.reader.read_csv, source)
+
+	async def aread_spreadsheet(
+			self, io, sheet_name: str | int | list | None = None
+	) -> pd.DataFrame | dict[str | int, pd.DataFrame]:
+		source = await self._read_source(io)
+		return await self._run(self._get_executor(source), self.reader.read_spreadsheet, source, sheet_name)
+
+	async def aiter_csv(
+			self,
+			filepath_or_buffer,
+			chunksize: int = DefaultSettings.CHUNKSIZE,
+			queue_size: int = DefaultSettings.ASYNC_QUEUE_SIZE
+	) -> AsyncIterator[pd.DataFrame]:
+		# Chunks are parsed on a thread at most queue_size ahead of the consumer. Async inputs are
+		# streamed, not read up front. Closing the iterator stops the parser at the next chunk.
+		loop = asyncio.get_running_loop()
+		source = filepath_or_buffer
+		if isinstance(source, (bytes, bytearray, memoryview)):
+			source = io.BytesIO(source)
+		elif _is_async_stream(source):
+			source = io.BufferedReader(AsyncStreamBridge(source, loop))
+		queue = asyncio.Queue(maxsize=queue_size)
+		stop = threading.Event()
+
+		async def put(item: tuple[pd.DataFrame | None, BaseException | None]):
+			if not stop.is_set():
+				await queue.put(item)
+
+		def produce():
+			item = (None, None)
+			try:
+				for chunk in self.reader.iter_csv(source, chunksize):
+					asyncio.run_coroutine_threadsafe(put((chunk, None)), loop).result()
+					if stop.is_set():
+						return
+			except BaseException as e:
+				item = (None, e)
+			asyncio.run_coroutine_threadsafe(put(item), loop).result()
+
+		await self._submit(self._get_thread_executor(), produce)
+		try:
+			while True:
+				chunk, error = await queue.get()
+				if error is not None:
+					raise error
+				if chunk is None:
+					break
+				yield chunk
+		finally:
+			stop.set()
+			# Unblocks a producer waiting on a full queue.
+			while not queue.empty():
+				queue.get_nowait()
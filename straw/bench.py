@@ -0,0 +1,307 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from straw.df_transform import DataFrameTransformer
+from straw.mapping import ColumnMapping
+from straw.reader import TabularDataReader
+from straw.settings import DataSettings, FileSettings
+
+
+class BenchShape:
+	def __init__(
+			self,
+			name: str,
+			rows: int,
+			columns: int = 8,
+			na_density: float = 0.1,
+			cardinality: int = 100,
+			mappings: int = 0,
+			file_types: tuple[str, ...] = ('csv',)
+	):
+		self.name = name
+		self.rows = rows
+		self.columns = columns
+		self.na_density = na_density
+		# Number of distinct values in string columns.
+		self.cardinality = cardinality
+		self.mappings = mappings
+		self.file_types = file_types
+
+
+SHAPES = {
+	'long': BenchShape('long', 200_000),
+	'wide': BenchShape('wide', 2_000, columns=1_000, mappings=200),
+	'mapped': BenchShape('mapped', 200_000, columns=20, mappings=20),
+	'sparse': BenchShape('sparse', 200_000, na_density=0.5, cardinality=10),
+	'sheet': BenchShape('sheet', 5_000, mappings=4, file_types=('xlsx', 'ods')),
+}
+CASES = ('read_csv', 'read_csv_pyarrow', 'read_spreadsheet', 'transform', 'to_list_of_dict', 'get_schema')
+
+
+def measure(func: Callable) -> tuple[object, float, int]:
+	# Tracing allocations slows the call down, so it is timed in a separate untraced run.
+	start = time.perf_counter()
+	result = func()
+	seconds = time.perf_counter() - start
+	del result
+	tracemalloc.start()
+	try:
+		result = func()
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	return result, seconds, peak
+
+
+def reset_peak_rss() -> int | None:
+	# Resetting the high-water mark needs Linux, elsewhere the peak is the one of the whole process.
+	try:
+		with open('/proc/self/clear_refs', 'w') as f:
+			f.write('5')
+	except OSError:
+		pass
+	return get_peak_rss()
+
+
+def get_peak_rss() -> int | None:
+	# None where neither /proc nor the resource module exist, e.g. on Windows.
+	try:
+		with open('/proc/self/status') as f:
+			for line in f:
+				if line.startswith('VmHWM:'):
+					return int(line.split()[1]) * 1024
+	except OSError:
+		pass
+	try:
+		import resource
+	except ImportError:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure_throughput(func: Callable, rows: int, input_bytes: int, repeat: int = 3) -> dict:
+	# The fastest run is kept, peak RSS is taken over all runs.
+	seconds = float('inf')
+	rss = reset_peak_rss()
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = func()
+		seconds = min(seconds, time.perf_counter() - start)
+		del result
+	peak = get_peak_rss()
+	return {
+		'seconds': seconds,
+		'rows_per_second': rows / seconds if seconds else None,
+		'bytes_per_second': input_bytes / seconds if seconds else None,
+		'peak_rss_bytes': peak,
+		'rss_delta_bytes': peak - rss if peak is not None and rss is not None else None,
+	}
+
+
+def generate_table(shape: BenchShape, seed: int = 0) -> pd.DataFrame:
+	# Columns cycle through integer, float, string and boolean, the first one is a complete id.
+	rng = np.random.default_rng(seed)
+	labels = np.array([f"value_{i}" for i in range(max(shape.cardinality, 1))], dtype=object)
+	columns = dict()
+	for i in range(shape.columns):
+		kind = ('int', 'float', 'str', 'bool')[i % 4]
+		if i == 0:
+			values = np.arange(shape.rows)
+		elif kind == 'int':
+			values = rng.integers(0, 1_000_000, shape.rows)
+		elif kind == 'float':
+			values = rng.random(shape.rows)
+		elif kind == 'str':
+			values = rng.choice(labels, shape.rows)
+		else:
+			values = rng.random(shape.rows) < 0.5
+		series = pd.Series(values)
+		if i > 0 and shape.na_density > 0:
+			series = series.mask(rng.random(shape.rows) < shape.na_density)
+		columns[f"{kind}_{i}"] = series
+	return pd.DataFrame(columns)
+
+
+def generate_mappings(column_names: list[str], count: int) -> list[ColumnMapping]:
+	# Exact, case-insensitive and prefix matches, the kinds of mappings used in practice.
+	column_mappings = list[ColumnMapping]()
+	for i in range(count):
+		column_name = column_names[i % len(column_names)]
+		target = f"target_{i}"
+		if i % 3 == 0:
+			column_mappings.append(ColumnMapping(column_name, target_identifier=target))
+		elif i % 3 == 1:
+			column_mappings.append(ColumnMapping(column_name.upper(), target_identifier=target, name_is_case_sensitive=False))
+		else:
+			column_mappings.append(ColumnMapping(ColumnMapping.source_identifier_starts_with(column_name),
+												 target_identifier=target))
+	return column_mappings
+
+
+def write_table(df: pd.DataFrame, file_type: str, directory: str, name: str) -> str:
+	path = os.path.join(directory, f"{name}.{file_type}")
+	if file_type == 'csv':
+		df.to_csv(path, index=False)
+	else:
+		df.to_excel(path, index=False, engine='odf' if file_type == 'ods' else 'openpyxl')
+	return path
+
+
+def bench_shape(shape: BenchShape, directory: str, cases: tuple[str, ...] = CASES, repeat: int = 3) -> list[dict]:
+	df = generate_table(shape)
+	column_mappings = generate_mappings(list(df.columns), shape.mappings) if shape.mappings else None
+	frame_bytes = int(df.memory_usage(deep=True).sum())
+	results = list[dict]()
+
+	def add(case: str, file_type: str | None, func: Callable, rows: int, input_bytes: int):
+		result = {'case': case, 'shape': shape.name, 'file_type': file_type, 'rows': rows, 'columns': shape.columns,
+				  'mappings': shape.mappings, 'input_bytes': input_bytes}
+		result.update(measure_throughput(func, rows, input_bytes, repeat))
+		results.append(result)
+
+	reader = TabularDataReader(column_mappings=column_mappings)
+	for file_type in shape.file_types:
+		path = write_table(df, file_type, directory, shape.name)
+		case = 'read_csv' if file_type == 'csv' else 'read_spreadsheet'
+		if case in cases:
+			read = reader.read_csv if file_type == 'csv' else lambda x: reader.read_spreadsheet(x, 0)
+			add(case, file_type, lambda: read(path), shape.rows, os.path.getsize(path))
+		if file_type == 'csv' and 'read_csv_pyarrow' in cases:
+			arrow_reader = TabularDataReader(column_mappings=column_mappings, file_settings=FileSettings(engine='pyarrow'))
+			add('read_csv_pyarrow', file_type, lambda: arrow_reader.read_csv(path), shape.rows, os.path.getsize(path))
+	if 'transform' in cases:
+		# A new transformer each run, so the mapping plan is compiled like for a new file.
+		add('transform', None, lambda: DataFrameTransformer(column_mappings).transform(df), shape.rows, frame_bytes)
+	transformed = DataFrameTransformer(column_mappings).transform(df)
+	transformed_bytes = int(transformed.memory_usage(deep=True).sum())
+	if 'to_list_of_dict' in cases:
+		add('to_list_of_dict', None, lambda: DataFrameTransformer.to_list_of_dict(transformed, True), shape.rows,
+			transformed_bytes)
+	if 'get_schema' in cases:
+		add('get_schema', None, lambda: DataFrameTransformer.get_schema(transformed), shape.rows, transformed_bytes)
+	return results
+
+
+def run_suite(
+		shapes: list[BenchShape] | None = None, cases: tuple[str, ...] = CASES, repeat: int = 3
+) -> list[dict]:
+	results = list[dict]()
+	with tempfile.TemporaryDirectory() as directory:
+		for shape in shapes if shapes is not None else SHAPES.values():
+			results.extend(bench_shape(shape, directory, cases, repeat))
+	return results
+
+
+def compare(baseline: list[dict], current: list[dict], tolerance: float = 0.1) -> list[dict]:
+	# Matches results by case, shape and file type, a ratio above 1 + tolerance is a regression.
+	def key(x: dict) -> tuple:
+		return x['case'], x['shape'], x['file_type']
+
+	baseline_results = {key(x): x for x in baseline}
+	comparison = list[dict]()
+	for result in current:
+		base = baseline_results.get(key(result))
+		if base is None:
+			continue
+		seconds_ratio = result['seconds'] / base['seconds'] if base['seconds'] else None
+		rss_ratio = None
+		if result['rss_delta_bytes'] is not None and (base['rss_delta_bytes'] or 0) > 0:
+			rss_ratio = result['rss_delta_bytes'] / base['rss_delta_bytes']
+		comparison.append({
+			'case': result['case'], 'shape': result['shape'], 'file_type': result['file_type'],
+			'seconds_ratio': seconds_ratio,
+			'rss_delta_ratio': rss_ratio,
+			'regression': any(x is not None and x > 1 + tolerance for x in (seconds_ratio, rss_ratio)),
+		})
+	return comparison
+
+
+def read_results(path: str) -> list[dict]:
+	with open(path) as f:
+		return [json.loads(x) for x in f if x.strip()]
+
+
+def generate_frame(rows: int, na_density: float = 0.1, seed: int = 0) -> pd.DataFrame:
+	rng = np.random.default_rng(seed)
+	df = pd.DataFrame({
+		'id': np.arange(rows),
+		'amount': rng.integers(0, 1_000_000, rows),
+		'ratio': rng.random(rows),
+		'flag': rng.random(rows) < 0.5,
+		'label': rng.choice(['red', 'green', 'blue', 'yellow'], rows),
+	})
+	for column_name in ['amount', 'ratio', 'flag', 'label']:
+		df[column_name] = df[column_name].mask(rng.random(rows) < na_density)
+	return df
+
+
+def bench_na_handling(rows: int = 1_000_000, na_density: float = 0.1) -> list[dict]:
+	data = generate_frame(rows, na_density).to_csv(index=False).encode()
+	results = list[dict]()
+	modes = {
+		'replace_na_with_none': DataSettings(),
+		'numpy_nullable': DataSettings(dtype_backend='numpy_nullable'),
+		'pyarrow': DataSettings(dtype_backend='pyarrow'),
+	}
+	for mode, data_settings in modes.items():
+		reader = TabularDataReader(data_settings=data_settings)
+		df, read_seconds, read_peak = measure(lambda: reader.read_csv(io.BytesIO(data)))
+		_, sum_seconds, _ = measure(lambda: df['amount'].sum())
+		_, records_seconds, records_peak = measure(lambda: reader.get_transformer().to_records(df))
+		results.append({
+			'mode': mode,
+			'rows': rows,
+			'frame_bytes': int(df.memory_usage(deep=True).sum()),
+			'read_seconds': read_seconds,
+			'read_peak_bytes': read_peak,
+			'sum_seconds': sum_seconds,
+			'records_seconds': records_seconds,
+			'records_peak_bytes': records_peak,
+		})
+	return results
+
+
+def main(argv: list[str]):
+	parser = argparse.ArgumentParser(prog='python -m straw.bench')
+	commands = parser.add_subparsers(dest='command', required=True)
+	run = commands.add_parser('run', help="run the suite, one JSON result per line")
+	run.add_argument('--shapes', default=','.join(SHAPES.keys()))
+	run.add_argument('--cases', default=','.join(CASES))
+	run.add_argument('--repeat', type=int, default=3)
+	run.add_argument('--output')
+	compare_parser = commands.add_parser('compare', help="compare two result files")
+	compare_parser.add_argument('baseline')
+	compare_parser.add_argument('current')
+	compare_parser.add_argument('--tolerance', type=float, default=0.1)
+	na = commands.add_parser('na', help="compare NA handling modes")
+	na.add_argument('rows', type=int, nargs='?', default=1_000_000)
+	args = parser.parse_args(argv)
+
+	if args.command == 'run':
+		results = run_suite([SHAPES[x] for x in args.shapes.split(',')], tuple(args.cases.split(',')), args.repeat)
+	elif args.command == 'compare':
+		results = compare(read_results(args.baseline), read_results(args.current), args.tolerance)
+	else:
+		results = bench_na_handling(args.rows)
+	lines = [json.dumps(x) for x in results]
+	print('\n'.join(lines))
+	if args.command == 'run' and args.output:
+		with open(args.output, 'w') as f:
+			f.write('\n'.join(lines) + '\n')
+	if args.command == 'compare' and any(x['regression'] for x in results):
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+from straw.settings import Default as DefaultSettings
+
+CACHE_FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def _code_token(code) -> list:
+	# Nested functions are code objects among the constants, their repr holds a memory address.
+	return [code.co_code.hex(), code.co_names,
+			[_code_token(x) if hasattr(x, 'co_code') else repr(x) for x in code.co_consts]]
+
+
+def _token(obj) -> object:
+	if callable(obj):
+		name = f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}"
+		code = getattr(obj, '__code__', None)
+		if code is None:
+			return name
+		# Lambdas and closures share their name, their code, defaults and captured values tell them apart.
+		return [name, _code_token(code), obj.__defaults__, [x.cell_contents for x in obj.__closure__ or ()]]
+	if hasattr(obj, '__dict__'):
+		return {type(obj).__name__: vars(obj)}
+	return repr(obj)
+
+
+class ReadCache:
+	# Transformed frames are stored as uncompressed Feather files, so a hit is a memory map instead of a re-parse.
+	def __init__(
+			self,
+			directory: str | os.PathLike,
+			max_bytes: int = DefaultSettings.CACHE_MAX_BYTES,
+			hash_content: bool = False
+	):
+		import pyarrow.feather  # noqa: F401, the cache needs pyarrow
+		self.directory = os.fspath(directory)
+		self.max_bytes = max_bytes
+		# Keys use the file content hash instead of path, modification time and size.
+		self.hash_content = hash_content
+		os.makedirs(self.directory, exist_ok=True)
+
+	def _get_source_token(self, source) -> str | None:
+		# URLs and buffers are not cached.
+		if not isinstance(source, (str, os.PathLike)):
+			return None
+		source = os.path.expanduser(source)
+		if not os.path.isfile(source):
+			return None
+		if self.hash_content:
+			digest = hashlib.sha256()
+			with open(source, 'rb') as f:
+				while block := f.read(1 << 20):
+					digest.update(block)
+			return digest.hexdigest()
+		stat = os.stat(source)
+		return f"{os.path.abspath(source)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+	def get_key(self, source, *parts) -> str | None:
+		source_token = self._get_source_token(source)
+		if source_token is None:
+			return None
+		key = json.dumps([CACHE_FORMAT_VERSION, source_token, *parts], default=_token, sort_keys=True)
+		return hashlib.sha256(key.encode()).hexdigest()
+
+	def get(self, key: str) -> pd.DataFrame | dict[str | int, pd.DataFrame] | None:
+		import pyarrow.feather
+		path = os.path.join(self.directory, key)
+		try:
+			with open(os.path.join(path, MANIFEST_FILE_NAME)) as f:
+				manifest = json.load(f)
+			os.utime(os.path.join(path, MANIFEST_FILE_NAME))
+			frames = dict()
+			for i, frame in enumerate(manifest['frames']):
+				df = pyarrow.feather.read_table(os.path.join(path, f"{i}.feather"), memory_map=True).to_pandas(
+					split_blocks=True)
+				df.columns = frame['columns']
+				for position in frame['object_columns']:
+					# Arrow types object columns by their values, None replacements are restored here.
+					series = df.iloc[:, position]
+					if series.dtype != object:
+						df.isetitem(position, series.astype(object).where(series.notna(), None))
+				frames[frame['key']] = df
+		except (OSError, ValueError, KeyError):
+			return None
+		return frames[None] if manifest['single'] else frames
+
+	def put(self, key: str, result: pd.DataFrame | dict[str | int, pd.DataFrame]):
+		import pyarrow
+		import pyarrow.feather
+		if isinstance(result, pd.DataFrame):
+			frames = {None: result}
+		elif all(isinstance(x, (str, int)) for x in result.keys()):
+			frames = result
+		else:
+			return
+		manifest = {'single': isinstance(result, pd.DataFrame), 'frames': list()}
+		path = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+		try:
+			for i, (frame_key, df) in enumerate(frames.items()):
+				columns = list(df.columns)
+				if not all(isinstance(x, (str, int)) for x in columns):
+					return
+				positional = df.set_axis([str(x) for x in range(len(columns))], axis=1, copy=False)
+				pyarrow.feather.write_feather(positional, os.path.join(path, f"{i}.feather"), compression='uncompressed')
+				object_columns = [x for x, dtype in enumerate(df.dtypes) if dtype == object]
+				manifest['frames'].append({'key': frame_key, 'columns': columns, 'object_columns': object_columns})
+			with open(os.path.join(path, MANIFEST_FILE_NAME), 'w') as f:
+				json.dump(manifest, f)
+			os.replace(path, os.path.join(self.directory, key))
+		except (OSError, ValueError, pyarrow.ArrowException):
+			# Not cacheable, e.g. object columns of mixed types, or another process stored the same key first.
+			return
+		finally:
+			shutil.rmtree(path, ignore_errors=True)
+		self.evict()
+
+	def get_entries(self) -> list[tuple[str, float, int]]:
+		entries = list[tuple[str, float, int]]()
+		for name in os.listdir(self.directory):
+			path = os.path.join(self.directory, name)
+			manifest_path = os.path.join(path, MANIFEST_FILE_NAME)
+			if name.startswith('.') or not os.path.exists(manifest_path):
+				continue
+			size = sum(x.stat().st_size for x in os.scandir(path))
+			entries.append((name, os.stat(manifest_path).st_mtime, size))
+		return entries
+
+	def evict(self):
+		entries = sorted(self.get_entries(), key=lambda x: x[1])
+		total = sum(x[2] for x in entries)
+		for name, _, size in entries:
+			if total <= self.max_bytes:
+				break
+			shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+			total -= size
+
+	def clear(self):
+		for name, _, _ in self.get_entries():
+			shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
@@ -0,0 +1,199 @@
+import sys
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable
+
+from straw.mapping import _contains
+
+NOT_FOUND = sys.maxsize
+
+
+class _MinTree:
+	# Segment tree answering the smallest value in a range of slots.
+	def __init__(self, values: list[int]):
+		self.size = len(values)
+		self.tree = [NOT_FOUND] * self.size + values
+		for i in range(self.size - 1, 0, -1):
+			self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+
+	def update(self, slot: int, value: int):
+		i = slot + self.size
+		self.tree[i] = value
+		while i > 1:
+			i //= 2
+			self.tree[i] = min(self.tree[2 * i], self.tree[2 * i + 1])
+
+	def min(self, lo: int, hi: int) -> int:
+		result = NOT_FOUND
+		lo += self.size
+		hi += self.size
+		while lo < hi:
+			if lo & 1:
+				result = min(result, self.tree[lo])
+				lo += 1
+			if hi & 1:
+				hi -= 1
+				result = min(result, self.tree[hi])
+			lo //= 2
+			hi //= 2
+		return result
+
+
+class _SortedKeys:
+	# Keys sorted once, a prefix is a range of them. Keys of renamed columns go to a small sorted overlay.
+	def __init__(self, keys: list[str]):
+		order = sorted(range(len(keys)), key=keys.__getitem__)
+		self.keys = [keys[i] for i in order]
+		self.slots = [0] * len(keys)
+		for slot, position in enumerate(order):
+			self.slots[position] = slot
+		self.in_base = [True] * len(keys)
+		self.tree = _MinTree(order)
+		self.overlay = list[tuple[str, int]]()
+
+	def remove(self, position: int, key: str):
+		if self.in_base[position]:
+			self.in_base[position] = False
+			self.tree.update(self.slots[position], NOT_FOUND)
+		else:
+			self.overlay.remove((key, position))
+
+	def add(self, position: int, key: str):
+		insort(self.overlay, (key, position))
+
+	def first(self, prefix: str) -> int:
+		lo = bisect_left(self.keys, prefix)
+		hi = bisect_right(self.keys, prefix, lo, key=lambda x: x[:len(prefix)])
+		first = self.tree.min(lo, hi)
+		for key, position in self.overlay[bisect_left(self.overlay, (prefix,)):]:
+			if not key.startswith(prefix):
+				break
+			first = min(first, position)
+		return first
+
+
+class _JoinedKeys:
+	# Keys joined in position order, the first occurrence of a substring is the first matching column.
+	def __init__(self, keys: list[str]):
+		self.starts = list[int]()
+		offset = 0
+		for key in keys:
+			self.starts.append(offset)
+			offset += len(key) + 1
+		self.joined = '\0'.join(keys)
+		self.in_base = [True] * len(keys)
+		self.overlay = dict[int, str]()
+
+	def remove(self, position: int, key: str):
+		if self.in_base[position]:
+			self.in_base[position] = False
+		else:
+			del self.overlay[position]
+
+	def add(self, position: int, key: str):
+		self.overlay[position] = key
+
+	def first(self, part: str) -> int:
+		first = NOT_FOUND
+		start = 0
+		while self.starts and (i := self.joined.find(part, start)) != -1:
+			slot = bisect_right(self.starts, i) - 1
+			if self.in_base[slot]:
+				first = slot
+				break
+			if slot + 1 >= len(self.starts):
+				break
+			start = self.starts[slot + 1]
+		for position, key in self.overlay.items():
+			if position < first and part in key:
+				first = position
+		return first
+
+
+class ColumnIndex:
+	# Finds the same first matching column as DataFrameTransformer._get_first_matching_column_name, while the
+	# columns are renamed mapping after mapping. Names are looked up in hash maps, starts_with and ends_with
+	# in sorted keys and contains in the joined names, these are built on first use.
+	def __init__(self, column_names: list[str]):
+		self.names = list(column_names)
+		self.positions = dict[str, list[int]]()
+		self.lower_positions = dict[str, list[int]]()
+		for position, name in enumerate(self.names):
+			self.positions.setdefault(name, list[int]()).append(position)
+			self.lower_positions.setdefault(name.lower(), list[int]()).append(position)
+		self.sorted_keys = dict[tuple[bool, bool], _SortedKeys]()
+		self.joined_keys = dict[bool, _JoinedKeys | None]()
+
+	@staticmethod
+	def _get_key(name: str, case_sensitive: bool, reverse: bool = False) -> str:
+		key = name if case_sensitive else name.lower()
+		return key[::-1] if reverse else key
+
+	def _get_sorted_keys(self, case_sensitive: bool, reverse: bool) -> _SortedKeys:
+		keys = self.sorted_keys.get((case_sensitive, reverse))
+		if keys is None:
+			keys = _SortedKeys([self._get_key(x, case_sensitive, reverse) for x in self.names])
+			self.sorted_keys[(case_sensitive, reverse)] = keys
+		return keys
+
+	def _get_joined_keys(self, case_sensitive: bool) -> _JoinedKeys | None:
+		# None when a name contains the separator, those columns are scanned instead.
+		if case_sensitive not in self.joined_keys:
+			keys = [self._get_key(x, case_sensitive) for x in self.names]
+			self.joined_keys[case_sensitive] = None if any('\0' in x for x in keys) else _JoinedKeys(keys)
+		return self.joined_keys[case_sensitive]
+
+	def _scan(self, func: Callable, param: str, name_is_case_sensitive: bool) -> str | None:
+		for name in self.names:
+			if func(name if name_is_case_sensitive else name.lower(), param):
+				return name
+		return None
+
+	def find(self, source_identifier: int | str | tuple[Callable, str], name_is_case_sensitive: bool) -> str | None:
+		if isinstance(source_identifier, int):
+			if len(self.names) > source_identifier:
+				return self.names[source_identifier]
+		elif isinstance(source_identifier, str):
+			if name_is_case_sensitive:
+				if source_identifier in self.positions:
+					return source_identifier
+			else:
+				positions = self.lower_positions.get(source_identifier.lower())
+				if positions:
+					return self.names[positions[0]]
+		elif isinstance(source_identifier, tuple):
+			func = source_identifier[0]
+			param = source_identifier[1] if name_is_case_sensitive else source_identifier[1].lower()
+			if func is str.startswith:
+				position = self._get_sorted_keys(name_is_case_sensitive, False).first(param)
+			elif func is str.endswith:
+				position = self._get_sorted_keys(name_is_case_sensitive, True).first(param[::-1])
+			elif func is _contains and '\0' not in param and self._get_joined_keys(name_is_case_sensitive) is not None:
+				position = self.joined_keys[name_is_case_sensitive].first(param)
+			else:
+				return self._scan(func, param, name_is_case_sensitive)
+			if position != NOT_FOUND:
+				return self.names[position]
+		return None
+
+	def get_positions(self, name: str) -> list[int]:
+		return list(self.positions.get(name, list[int]()))
+
+	def rename(self, name: str, target: str):
+		if name == target or name not in self.positions:
+			return
+		for position in self.positions.pop(name):
+			lower_positions = self.lower_positions[name.lower()]
+			lower_positions.remove(position)
+			if not lower_positions:
+				del self.lower_positions[name.lower()]
+			for (case_sensitive, reverse), keys in self.sorted_keys.items():
+				keys.remove(position, self._get_key(name, case_sensitive, reverse))
+				keys.add(position, self._get_key(target, case_sensitive, reverse))
+			for case_sensitive, keys in self.joined_keys.items():
+				if keys is None:
+					continue
+				keys.remove(position, self._get_key(name, case_sensitive))
+				keys.add(position, self._get_key(target, case_sensitive))
+			self.names[position] = target
+			insort(self.positions.setdefault(target, list[int]()), position)
+			insort(self.lower_positions.setdefault(target.lower(), list[int]()), position)
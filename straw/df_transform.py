@@ -1,71 +1,487 @@
-import json
+import contextlib
+import operator
+import threading
 from collections import OrderedDict
-from typing import Callable
+from typing import Callable, Iterator
 import numpy as np
 import pandas as pd
+from pandas.io.json import build_table_schema
 
-from straw.mapping import ColumnMapping
+from straw.column_index import ColumnIndex
+from straw.mapping import ColumnMapping, ColumnMappingPlan
 from straw.settings import DataSettings
 from straw.settings import Default as DefaultSettings
+from straw.stats import ReadStats
 
+ROW_FILTER_OPERATORS = {
+	'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+	'in': pd.Series.isin, 'not in': lambda series, values: ~series.isin(values)
+}
+ARROW_ROW_FILTER_FUNCTIONS = {
+	'==': 'equal', '!=': 'not_equal', '<': 'less', '<=': 'less_equal', '>': 'greater', '>=': 'greater_equal'
+}
+# Text the CSV parser reads as booleans, plus 1 and 0 as spreadsheets store them.
+BOOLEAN_STRINGS = {'true': True, 'false': False, '1': True, '0': False}
 
 class DataFrameTransformer:
 	def __init__(
 			self,
 			column_mappings: list[ColumnMapping] | None = None,
 			data_settings: DataSettings = DefaultSettings.DATA_SETTINGS,
+			plan_cache_size: int = DefaultSettings.PLAN_CACHE_SIZE,
+			stats: ReadStats | None = None,
+			row_filters: list[tuple[str, str, object] | Callable] | None = None
 	):
 		self.column_mappings: list[ColumnMapping] = column_mappings if column_mappings is not None else list[
 			ColumnMapping]()
 		self.data_settings = data_settings
+		self.plan_cache_size = plan_cache_size
+		self.plan_cache = OrderedDict[tuple, ColumnMappingPlan]()
+		self.plan_cache_hits = 0
+		self.plan_cache_misses = 0
+		self.stats = stats
+		# (column, operator, value) tuples against the target column names, or callables taking the frame and
+		# returning a boolean mask. Rows must match all of them.
+		self.row_filters = row_filters if row_filters is not None else list[tuple[str, str, object] | Callable]()
+		# Guards the plan cache, one transformer is shared by the threads of an AsyncTabularDataReader.
+		self._lock = threading.Lock()
+
+	def __getstate__(self) -> dict:
+		state = dict(self.__dict__)
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state: dict):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+
+	def _stage(self, stage: str, rows: int | None = None) -> contextlib.AbstractContextManager[dict]:
+		if self.stats is None:
+			return contextlib.nullcontext(dict())
+		return self.stats.stage(stage, rows)
 
 	def get_first_matching_column_name(
 			self,
 			df: pd.DataFrame,
 			source_identifier: int | str | tuple[Callable, str],
 			name_is_case_sensitive: bool
+	) -> str | None:
+		return self._get_first_matching_column_name(list(df.columns), source_identifier, name_is_case_sensitive)
+
+	@staticmethod
+	def _get_first_matching_column_name(
+			column_names: list,
+			source_identifier: int | str | tuple[Callable, str],
+			name_is_case_sensitive: bool
 	) -> str | None:
 		if isinstance(source_identifier, int):
-			if len(df.columns) > source_identifier:
-				return df.columns[source_identifier]
+			if len(column_names) > source_identifier:
+				return column_names[source_identifier]
 		elif isinstance(source_identifier, str):
 			if name_is_case_sensitive:
-				if source_identifier in df:
+				if source_identifier in column_names:
 					return source_identifier
 			elif not name_is_case_sensitive:
-				for column_name in df.columns:
+				for column_name in column_names:
 					if column_name.lower() == source_identifier.lower():
 						return column_name
 		elif isinstance(source_identifier, tuple):
 			func = source_identifier[0]
 			param = source_identifier[1] if name_is_case_sensitive else source_identifier[1].lower()
-			for column_name in df.columns:
+			for column_name in column_names:
 				name = column_name if name_is_case_sensitive else column_name.lower()
 				if func(name, param):
 					return column_name
 		return None
 
-	def transform(self, df: pd.DataFrame) -> pd.DataFrame:
-		if self.data_settings.replace_na_with_none:
-			df = df.replace(np.nan, None)
-
+	def _resolve_column_names(self, column_names: list) -> tuple[list, dict[int, ColumnMapping]]:
+		# Mappings are matched one after another against the already renamed columns.
+		renamed_column_names = list(column_names)
+		typed_columns = dict[int, ColumnMapping]()
+		index = None
+		# Wide tables with many mappings are matched through an index instead of scanning the columns per mapping.
+		if (len(column_names) * len(self.column_mappings) >= DefaultSettings.COLUMN_INDEX_THRESHOLD
+				and all(isinstance(x, str) for x in column_names)
+				and all(isinstance(m.target_identifier, (str, type(None))) for m in self.column_mappings)):
+			index = ColumnIndex(column_names)
 		for mapping in self.column_mappings:
-			matching_column_name = self.get_first_matching_column_name(df, mapping.source_identifier,
-																	   mapping.name_is_case_sensitive)
+			if index is not None:
+				matching_column_name = index.find(mapping.source_identifier, mapping.name_is_case_sensitive)
+			else:
+				matching_column_name = self._get_first_matching_column_name(renamed_column_names, mapping.source_identifier,
+																			mapping.name_is_case_sensitive)
 			if matching_column_name:
+				if index is not None:
+					positions = index.get_positions(matching_column_name)
+				else:
+					positions = [i for i, x in enumerate(renamed_column_names) if x == matching_column_name]
 				if mapping.target_identifier:
-					df = df.rename(columns={matching_column_name: mapping.target_identifier})
+					if index is not None:
+						index.rename(matching_column_name, mapping.target_identifier)
+					for i in positions:
+						renamed_column_names[i] = mapping.target_identifier
+				if mapping.target_datatype:
+					for i in positions:
+						typed_columns[i] = mapping
+		return renamed_column_names, typed_columns
+
+	def get_column_renames(self, column_names) -> dict:
+		column_names = list(column_names)
+		renamed_column_names, _ = self._resolve_column_names(column_names)
+		return {x: y for x, y in zip(column_names, renamed_column_names) if x != y}
+
+	def get_wanted_column_names(self, column_names) -> list:
+		return list(OrderedDict((x, 1) for x in [m.target_identifier for m in self.column_mappings if m.target_identifier in column_names]).keys())
 
+	def compile_plan(self, column_names) -> ColumnMappingPlan:
+		column_names = list(column_names)
+		renamed_column_names, typed_columns = self._resolve_column_names(column_names)
+		column_renames = {x: y for x, y in zip(column_names, renamed_column_names) if x != y}
+		wanted_column_names = self.get_wanted_column_names(set(renamed_column_names))
+		source_column_positions = None
 		if self.data_settings.remove_unwanted_columns and len(self.column_mappings) > 0:
-			wanted_column_names = OrderedDict((x, 1) for x in [m.target_identifier for m in self.column_mappings if m.target_identifier in df]).keys()
-			df = df[wanted_column_names]
+			wanted = set(wanted_column_names)
+			source_column_positions = [i for i, x in enumerate(renamed_column_names) if x in wanted]
+			typed_columns = {i: typed_columns[i] for i in source_column_positions if i in typed_columns}
+		source_datatypes = {column_names[i]: x for i, x in typed_columns.items()}
+		return ColumnMappingPlan(column_renames, wanted_column_names, source_column_positions, source_datatypes)
+
+	@staticmethod
+	def get_header_fingerprint(column_names) -> tuple:
+		return tuple(column_names)
+
+	def get_mapping_fingerprint(self) -> tuple:
+		# Mappings and settings can be changed in place, plans compiled before are not reused then.
+		return self.data_settings.remove_unwanted_columns, tuple(
+			(m.source_identifier, m.target_identifier, m.name_is_case_sensitive, m.target_datatype, m.datetime_format)
+			for m in self.column_mappings)
+
+	def get_plan(self, column_names) -> ColumnMappingPlan:
+		fingerprint = self.get_header_fingerprint(column_names)
+		key = (fingerprint, self.get_mapping_fingerprint())
+		with self._lock:
+			plan = self.plan_cache.get(key)
+			if plan is not None:
+				self.plan_cache_hits += 1
+				self.plan_cache.move_to_end(key)
+				return plan
+			self.plan_cache_misses += 1
+		plan = self.compile_plan(fingerprint)
+		if self.plan_cache_size > 0:
+			with self._lock:
+				self.plan_cache[key] = plan
+				while len(self.plan_cache) > self.plan_cache_size:
+					self.plan_cache.popitem(last=False)
+		return plan
+
+	@staticmethod
+	def _convert_datatype(series: pd.Series, mapping: ColumnMapping) -> pd.Series | None:
+		if mapping.is_datetime:
+			if pd.api.types.is_datetime64_any_dtype(series.dtype):
+				return None
+			return pd.to_datetime(series, format=mapping.datetime_format)
+		dtype = pd.api.types.pandas_dtype(mapping.target_datatype)
+		if series.dtype == dtype:
+			return None
+		if series.dtype == object and pd.api.types.is_bool_dtype(dtype):
+			return DataFrameTransformer._convert_boolean(series, dtype)
+		return series.astype(dtype)
+
+	@staticmethod
+	def _convert_boolean(series: pd.Series, dtype) -> pd.Series:
+		# astype(bool) makes every non-empty string True. Missing values need the nullable 'boolean' target, like
+		# the parsers do when the type is pushed down.
+		def convert(value) -> bool | None:
+			if isinstance(value, str):
+				key = value.strip().lower()
+				if key in BOOLEAN_STRINGS:
+					return BOOLEAN_STRINGS[key]
+			elif isinstance(value, (bool, np.bool_)):
+				return bool(value)
+			elif pd.api.types.is_scalar(value) and pd.isna(value):
+				return None
+			elif isinstance(value, (int, float)) and value in (0, 1):
+				return bool(value)
+			raise ValueError(f"Can not convert {value!r} in column '{series.name}' to bool")
+
+		values = pd.array([convert(x) for x in series], dtype='boolean')
+		if dtype == bool:
+			if values.isna().any():
+				raise ValueError(f"Bool column has NA values in column '{series.name}'")
+			values = values.to_numpy(dtype=bool)
+		else:
+			values = values.astype(dtype)
+		return pd.Series(values, index=series.index, name=series.name)
+
+	def _optimize_datatype(self, series: pd.Series) -> pd.Series | None:
+		if self.data_settings.downcast_numeric:
+			if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+				downcast = pd.to_numeric(series, downcast='integer')
+				return downcast if downcast.dtype != series.dtype else None
+			if pd.api.types.is_float_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+				downcast = pd.to_numeric(series, downcast='float')
+				return downcast if downcast.dtype != series.dtype else None
+		if self.data_settings.category_threshold is not None and series.dtype == object and len(series) > 0:
+			if series.nunique() <= self.data_settings.category_threshold * len(series):
+				return series.astype('category')
+		return None
+
+	@staticmethod
+	def _project(df: pd.DataFrame, positions: list[int], column_names: list) -> pd.DataFrame:
+		# A new frame around the same column arrays, df[names], iloc and rename would copy them.
+		if len(positions) == df.shape[1] and all(i == x for i, x in enumerate(positions)):
+			if list(df.columns) == column_names:
+				return df
+			return df.set_axis(column_names, axis=1, copy=False)
+		projected = pd.DataFrame({i: df.iloc[:, x] for i, x in enumerate(positions)}, index=df.index, copy=False)
+		return projected.set_axis(column_names, axis=1, copy=False)
+
+	def transform(self, df: pd.DataFrame, plan: ColumnMappingPlan | None = None, owned: bool = False) -> pd.DataFrame:
+		# Renaming and selecting are a single projection, no values are copied. Frames the caller owns, e.g. just
+		# parsed ones, may have their object columns changed in place when NA is replaced.
+		if plan is None:
+			with self._stage('plan'):
+				plan = self.get_plan(df.columns)
+
+		column_names = [plan.column_renames.get(x, x) for x in df.columns]
+		positions = list(range(len(column_names)))
+		if self.data_settings.remove_unwanted_columns and len(self.column_mappings) > 0:
+			column_positions = dict()
+			for i, column_name in enumerate(column_names):
+				column_positions.setdefault(column_name, list[int]()).append(i)
+			positions = [i for x in plan.wanted_column_names for i in column_positions[x]]
+		with self._stage('select', len(df)) if len(positions) < len(column_names) or plan.column_renames else contextlib.nullcontext():
+			df = self._project(df, positions, [column_names[i] for i in positions])
+
+		return self.convert(df, plan, owned=owned)
 
+	def convert(
+			self, df: pd.DataFrame, plan: ColumnMappingPlan, row_filters: list[tuple[str, str, object] | Callable] | None = None,
+			owned: bool = False
+	) -> pd.DataFrame:
+		# Converts datatypes, filters rows and replaces NA of a frame already renamed and selected by the plan.
+		# Rows are filtered on the declared datatypes, so only matching rows are optimized and NA-replaced.
+		# row_filters replaces the transformer's own, e.g. when some were already applied.
+		row_filters = row_filters if row_filters is not None else self.row_filters
+		# Columns with a declared or optimized datatype keep it, NA replacement would turn them into objects.
+		typed_column_names = set()
+		if plan.source_datatypes:
+			with self._stage('convert', len(df)):
+				converted_columns = dict()
+				for source_column_name, mapping in plan.source_datatypes.items():
+					column_name = plan.column_renames.get(source_column_name, source_column_name)
+					if column_name in df:
+						typed_column_names.add(column_name)
+						converted = self._convert_datatype(df[column_name], mapping)
+						if converted is not None:
+							converted_columns[column_name] = converted
+				df = self._set_columns(df, converted_columns)
+
+		if row_filters:
+			with self._stage('filter', len(df)):
+				filtered = self.filter_rows(df, row_filters)
+				# Filtered rows are a copy.
+				owned = owned or filtered is not df
+				df = filtered
+
+		if self.data_settings.downcast_numeric or self.data_settings.category_threshold is not None:
+			with self._stage('optimize', len(df)):
+				converted_columns = dict()
+				for column_name in df.columns:
+					if column_name not in typed_column_names:
+						converted = self._optimize_datatype(df[column_name])
+						if converted is not None:
+							typed_column_names.add(column_name)
+							converted_columns[column_name] = converted
+				df = self._set_columns(df, converted_columns)
+
+		if self.data_settings.dtype_backend:
+			if any(isinstance(x, np.dtype) and x.kind in 'biufO' for x in df.dtypes):
+				with self._stage('convert_dtypes', len(df)):
+					df = df.convert_dtypes(dtype_backend=self.data_settings.dtype_backend)
+		elif self.data_settings.replace_na_with_none:
+			with self._stage('replace_na', len(df)):
+				df = self._replace_na(df, typed_column_names, owned)
+
+		return df
+
+	@staticmethod
+	def _replace_na(df: pd.DataFrame, typed_column_names: set, owned: bool) -> pd.DataFrame:
+		# Only float and object columns holding NaN change, the others are kept as they are.
+		replaced_columns = dict[int, pd.Series]()
+		for i, column_name in enumerate(df.columns):
+			series = df.iloc[:, i]
+			if column_name in typed_column_names or series.dtype.kind not in 'fcO':
+				continue
+			# One isna pass per column, it is the expensive part on object columns.
+			mask = series.isna().to_numpy()
+			if not mask.any():
+				continue
+			if owned and series.dtype == object:
+				series.to_numpy()[mask] = None
+			else:
+				values = series.to_numpy(dtype=object, copy=True)
+				values[mask] = None
+				replaced_columns[i] = pd.Series(values, index=series.index, name=series.name, copy=False)
+		if replaced_columns:
+			df = df.copy(deep=False)
+			for i, series in replaced_columns.items():
+				df.isetitem(i, series)
 		return df
 
 	@staticmethod
-	def to_list_of_dict(df: pd.DataFrame) -> list[dict]:
-		return df.to_dict('records')
+	def _set_columns(df: pd.DataFrame, columns: dict) -> pd.DataFrame:
+		if columns:
+			df = df.copy(deep=False)
+			for column_name, values in columns.items():
+				df[column_name] = values
+		return df
+
+	@staticmethod
+	def _get_row_filter(row_filter: tuple[str, str, object], column_names) -> tuple[str, str, object]:
+		column_name, op, value = row_filter
+		if op not in ROW_FILTER_OPERATORS:
+			raise ValueError(f"Unknown row filter operator '{op}'")
+		if column_name not in column_names:
+			raise ValueError(f"Row filter column '{column_name}' not found")
+		return column_name, op, value
+
+	def filter_rows(
+			self, df: pd.DataFrame, row_filters: list[tuple[str, str, object] | Callable] | None = None
+	) -> pd.DataFrame:
+		mask = None
+		for row_filter in row_filters if row_filters is not None else self.row_filters:
+			if callable(row_filter):
+				row_mask = row_filter(df)
+			else:
+				column_name, op, value = self._get_row_filter(row_filter, df.columns)
+				row_mask = ROW_FILTER_OPERATORS[op](df[column_name], value)
+			# Missing values in nullable masks do not match.
+			if isinstance(row_mask, pd.Series):
+				row_mask = row_mask.fillna(False)
+			row_mask = np.asarray(row_mask, dtype=bool)
+			mask = row_mask if mask is None else mask & row_mask
+		if mask is None or mask.all():
+			return df
+		return df[mask]
+
+	def filter_table(self, table, row_filters: list[tuple[str, str, object] | Callable] | None = None):
+		# Callables get the pa.Table here and return a boolean array.
+		import pyarrow as pa
+		import pyarrow.compute as pc
+		mask = None
+		for row_filter in row_filters if row_filters is not None else self.row_filters:
+			if callable(row_filter):
+				row_mask = row_filter(table)
+			else:
+				column_name, op, value = self._get_row_filter(row_filter, table.column_names)
+				column = table.column(column_name)
+				if op in ('in', 'not in'):
+					row_mask = pc.is_in(column, value_set=pa.array(list(value)).cast(column.type))
+					if op == 'not in':
+						row_mask = pc.invert(row_mask)
+				else:
+					row_mask = pc.call_function(ARROW_ROW_FILTER_FUNCTIONS[op], [column, pa.scalar(value).cast(column.type)])
+					if op == '!=':
+						# Like pandas, missing values are unequal to everything.
+						row_mask = pc.fill_null(row_mask, True)
+			mask = row_mask if mask is None else pc.and_(mask, row_mask)
+		if mask is None:
+			return table
+		return table.filter(mask)
+
+	@staticmethod
+	def _convert_arrow_datatype(column, mapping: ColumnMapping):
+		import pyarrow as pa
+		import pyarrow.compute as pc
+		arrow_type = mapping.arrow_type
+		if arrow_type is None or column.type == arrow_type:
+			return None
+		if mapping.is_datetime and mapping.datetime_format and pa.types.is_string(column.type):
+			return pc.strptime(column, format=mapping.datetime_format, unit='ns')
+		return column.cast(arrow_type)
+
+	def transform_table(
+			self, table, plan: ColumnMappingPlan | None = None,
+			row_filters: list[tuple[str, str, object] | Callable] | None = None
+	):
+		# Renaming and selecting only relabel and pick the column chunks of the pa.Table, no values are copied.
+		# Columns are matched by name, so the table may already be projected to the planned columns.
+		# Missing values stay null and datatypes Arrow has no equivalent for are left as parsed. Rows are filtered
+		# after the conversion.
+		if plan is None:
+			with self._stage('plan'):
+				plan = self.get_plan(table.column_names)
+
+		if plan.column_renames:
+			with self._stage('rename', table.num_rows):
+				table = table.rename_columns([plan.column_renames.get(x, x) for x in table.column_names])
+
+		if self.data_settings.remove_unwanted_columns and len(self.column_mappings) > 0:
+			with self._stage('select', table.num_rows):
+				positions = dict[str, list[int]]()
+				for i, column_name in enumerate(table.column_names):
+					positions.setdefault(column_name, list[int]()).append(i)
+				table = table.select([i for x in plan.wanted_column_names for i in positions.get(x, ())])
+
+		if plan.source_datatypes:
+			with self._stage('convert', table.num_rows):
+				mappings = {plan.column_renames.get(k, k): v for k, v in plan.source_datatypes.items()}
+				for i, column_name in enumerate(table.column_names):
+					if column_name in mappings:
+						converted = self._convert_arrow_datatype(table.column(i), mappings[column_name])
+						if converted is not None:
+							table = table.set_column(i, column_name, converted)
+
+		row_filters = row_filters if row_filters is not None else self.row_filters
+		if row_filters:
+			with self._stage('filter', table.num_rows):
+				table = self.filter_table(table, row_filters)
+		return table
+
+	@staticmethod
+	def _get_column_values(series: pd.Series, replace_na_with_none: bool) -> list:
+		if replace_na_with_none and series.hasnans:
+			values = series.to_numpy(dtype=object, copy=True)
+			values[series.isna().to_numpy()] = None
+			return values.tolist()
+		return series.tolist()
+
+	@staticmethod
+	def to_list_of_dict(df: pd.DataFrame, replace_na_with_none: bool = False) -> list[dict]:
+		if not replace_na_with_none:
+			return df.to_dict('records')
+		column_names = list(df.columns)
+		columns = [DataFrameTransformer._get_column_values(df.iloc[:, i], True) for i in range(len(column_names))]
+		return [dict(zip(column_names, row)) for row in zip(*columns)]
+
+	def to_records(self, df: pd.DataFrame) -> list[dict]:
+		return self.to_list_of_dict(df, self.data_settings.replace_na_with_none)
+
+	def iter_records(self, df: pd.DataFrame, batch_size: int = DefaultSettings.RECORD_BATCH_SIZE) -> Iterator[list[dict]]:
+		# Only one batch of row dicts exists at a time.
+		column_names = list(df.columns)
+		for start in range(0, len(df), batch_size):
+			batch = df.iloc[start:start + batch_size]
+			columns = [self._get_column_values(batch.iloc[:, i], self.data_settings.replace_na_with_none)
+					   for i in range(len(column_names))]
+			yield [dict(zip(column_names, row)) for row in zip(*columns)]
+
+	def to_columns(self, df: pd.DataFrame, as_arrays: bool = False) -> dict[str, list | np.ndarray]:
+		columns = dict()
+		for i, column_name in enumerate(df.columns):
+			series = df.iloc[:, i]
+			if not as_arrays:
+				columns[column_name] = self._get_column_values(series, self.data_settings.replace_na_with_none)
+			elif self.data_settings.replace_na_with_none and series.hasnans:
+				values = series.to_numpy(dtype=object, copy=True)
+				values[series.isna().to_numpy()] = None
+				columns[column_name] = values
+			else:
+				columns[column_name] = series.to_numpy()
+		return columns
 
 	@staticmethod
 	def get_schema(df: pd.DataFrame) -> dict:
-		return json.loads(df.to_json(orient="table")).get('schema')
+		# Built from the dtypes and the index only, the same schema to_json(orient="table") writes.
+		return build_table_schema(df, index=True)
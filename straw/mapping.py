@@ -8,16 +8,43 @@ class ColumnMapping:
 	target_identifier: str | None
 	target_datatype: str | None
 	name_is_case_sensitive: bool
+	datetime_format: str | None
 
 	def __init__(
 		self,
 		source_identifier: int | str | tuple[Callable, str],
 		target_identifier: str | None = None,
-		name_is_case_sensitive: bool = True
+		name_is_case_sensitive: bool = True,
+		target_datatype: str | None = None,
+		datetime_format: str | None = None
 	):
 		self.source_identifier = source_identifier
 		self.target_identifier = target_identifier
 		self.name_is_case_sensitive = name_is_case_sensitive
+		self.target_datatype = target_datatype
+		self.datetime_format = datetime_format
+
+	@property
+	def is_datetime(self) -> bool:
+		return self.target_datatype is not None and self.target_datatype.startswith('datetime')
+
+	@property
+	def arrow_type(self):
+		# None when Arrow has no equivalent, e.g. category or object, pandas converts those after to_pandas.
+		import pyarrow as pa
+		if self.target_datatype is None:
+			return None
+		if self.is_datetime:
+			return pa.timestamp('ns')
+		dtype = pd.api.types.pandas_dtype(self.target_datatype)
+		if isinstance(dtype, pd.ArrowDtype):
+			return dtype.pyarrow_dtype
+		if isinstance(dtype, pd.StringDtype):
+			return pa.string()
+		try:
+			return pa.from_numpy_dtype(getattr(dtype, 'numpy_dtype', dtype))
+		except (TypeError, pa.ArrowNotImplementedError):
+			return None
 
 	@staticmethod
 	def source_identifier_starts_with(name: str) -> tuple[Callable, str]:
@@ -29,6 +56,46 @@ class ColumnMapping:
 
 	@staticmethod
 	def source_identifier_contains(name: str) -> tuple[Callable, str]:
-		return lambda column_name, param: param in column_name, name
+		return _contains, name
+
+
+def _contains(column_name: str, param: str) -> bool:
+	# Module level so mappings can be pickled into worker processes.
+	return param in column_name
+
+
+@dataclass
+class ColumnMappingPlan:
+	column_renames: dict
+	wanted_column_names: list
+	source_column_positions: list[int] | None
+	source_datatypes: dict[str, ColumnMapping]
 
+	def get_parser_parameters(self, date_format: bool = True, bool_types: bool = True) -> dict:
+		parameters = {}
+		if self.source_column_positions:
+			parameters['usecols'] = self.source_column_positions
+		# The spreadsheet parsers turn any text but True and False into True for bool types, the transformer
+		# converts those columns instead.
+		dtype = {k: v.target_datatype for k, v in self.source_datatypes.items() if not v.is_datetime
+				 and (bool_types or not pd.api.types.is_bool_dtype(pd.api.types.pandas_dtype(v.target_datatype)))}
+		if dtype:
+			parameters['dtype'] = dtype
+		parse_dates = [k for k, v in self.source_datatypes.items() if v.is_datetime]
+		if parse_dates:
+			parameters['parse_dates'] = parse_dates
+		# Spreadsheet date cells are already typed, pandas would format them back to text to apply date_format.
+		date_formats = {k: v.datetime_format for k, v in self.source_datatypes.items() if v.is_datetime and v.datetime_format}
+		if date_format and date_formats:
+			parameters['date_format'] = date_formats
+		return parameters
 
+	def get_arrow_convert_options(self, column_names: list[str]) -> dict:
+		# Dates are left to Arrow's inference and converted afterwards, its timestamp parsers are not per column.
+		parameters = {}
+		if self.source_column_positions:
+			parameters['include_columns'] = [column_names[i] for i in self.source_column_positions]
+		column_types = {k: v.arrow_type for k, v in self.source_datatypes.items() if not v.is_datetime and v.arrow_type is not None}
+		if column_types:
+			parameters['column_types'] = column_types
+		return parameters
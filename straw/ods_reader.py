@@ -0,0 +1,179 @@
+import datetime
+import re
+import zipfile
+from typing import Container, Iterator
+from xml.etree.ElementTree import iterparse
+from xml.parsers import expat
+
+import pandas as pd
+
+ODS_MIMETYPE = b'application/vnd.oasis.opendocument.spreadsheet'
+OFFICE_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+TABLE_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+TEXT_NAMESPACE = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+TABLE = f'{{{TABLE_NAMESPACE}}}table'
+TABLE_NAME = f'{{{TABLE_NAMESPACE}}}name'
+TABLE_ROW = f'{{{TABLE_NAMESPACE}}}table-row'
+TABLE_CELL = f'{{{TABLE_NAMESPACE}}}table-cell'
+COVERED_TABLE_CELL = f'{{{TABLE_NAMESPACE}}}covered-table-cell'
+ROWS_REPEATED = f'{{{TABLE_NAMESPACE}}}number-rows-repeated'
+COLUMNS_REPEATED = f'{{{TABLE_NAMESPACE}}}number-columns-repeated'
+VALUE_TYPE = f'{{{OFFICE_NAMESPACE}}}value-type'
+VALUE = f'{{{OFFICE_NAMESPACE}}}value'
+DATE_VALUE = f'{{{OFFICE_NAMESPACE}}}date-value'
+TIME_VALUE = f'{{{OFFICE_NAMESPACE}}}time-value'
+BOOLEAN_VALUE = f'{{{OFFICE_NAMESPACE}}}boolean-value'
+TEXT_S = f'{{{TEXT_NAMESPACE}}}s'
+TEXT_C = f'{{{TEXT_NAMESPACE}}}c'
+
+TIME_VALUE_PATTERN = re.compile(r'PT(\d+)H(\d+)M(\d+(?:\.\d+)?)S')
+
+
+def is_ods(io) -> bool:
+	if isinstance(io, (bytes, bytearray, memoryview)):
+		return False
+	position = io.tell() if hasattr(io, 'tell') else None
+	try:
+		with zipfile.ZipFile(io) as archive:
+			return 'mimetype' in archive.namelist() and archive.read('mimetype').strip() == ODS_MIMETYPE
+	except (zipfile.BadZipFile, OSError):
+		return False
+	finally:
+		if position is not None:
+			io.seek(position)
+
+
+def _get_text(elem) -> str:
+	# Same decoding as pandas' odf reader: <text:s> is a run of spaces, paragraphs are joined as is.
+	value = [elem.text.strip('\n')] if elem.text else []
+	for child in elem:
+		if child.tag == TEXT_S:
+			value.append(' ' * int(child.get(TEXT_C, 1)))
+		else:
+			value.append(_get_text(child))
+		if child.tail:
+			value.append(child.tail.strip('\n'))
+	return ''.join(value)
+
+
+def _convert_cell(cell):
+	cell_type = cell.get(VALUE_TYPE)
+	if cell_type is None:
+		return None
+	if cell_type == 'float':
+		value = float(cell.get(VALUE))
+		return int(value) if value.is_integer() else value
+	if cell_type in ('percentage', 'currency'):
+		return float(cell.get(VALUE))
+	text = _get_text(cell)
+	if text == '#N/A':
+		return None
+	if cell_type == 'string':
+		return text
+	if cell_type == 'boolean':
+		return text == 'TRUE' if text else cell.get(BOOLEAN_VALUE) == 'true'
+	if cell_type == 'date':
+		return pd.Timestamp(cell.get(DATE_VALUE))
+	if cell_type == 'time':
+		match = TIME_VALUE_PATTERN.fullmatch(cell.get(TIME_VALUE, ''))
+		if match:
+			seconds = float(match.group(3))
+			return datetime.time(int(match.group(1)) % 24, int(match.group(2)), int(seconds), round(seconds % 1 * 1e6))
+		return pd.Timestamp(text).time()
+	raise ValueError(f"Unrecognized type {cell_type}")
+
+
+class OdsReader:
+	# Streams content.xml out of the zip container without building the document tree.
+	def __init__(self, io):
+		self.archive = zipfile.ZipFile(io)
+		self._sheet_names: list[str] | None = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.archive.close()
+
+	@property
+	def sheet_names(self) -> list[str]:
+		if self._sheet_names is None:
+			# Only start tags are needed, expat reports them without building elements like iterparse does. Its names
+			# are namespace}name, the ElementTree ones without the leading brace.
+			names = list[str]()
+			parser = expat.ParserCreate(namespace_separator='}')
+
+			def start(tag: str, attributes: dict):
+				if tag == TABLE[1:]:
+					names.append(attributes.get(TABLE_NAME[1:]))
+
+			parser.StartElementHandler = start
+			with self.archive.open('content.xml') as f:
+				parser.ParseFile(f)
+			self._sheet_names = names
+		return self._sheet_names
+
+	def get_dimensions(self, sheet_name: str | int) -> tuple[int, int] | None:
+		rows = 0
+		columns = 0
+		for row_index, cells in self.iter_rows(sheet_name, columns=()):
+			rows = row_index + 1
+			columns = max(columns, max(cells.keys(), default=-1) + 1)
+		return rows, columns
+
+	def iter_rows(
+			self, sheet_name: str | int = 0, columns: Container[int] | None = None
+	) -> Iterator[tuple[int, dict[int, object]]]:
+		# Yields the 0-based row index with the non-empty cells by 0-based column index, only cells in columns
+		# are converted, the others are reported as None. Empty rows are skipped without expanding repeats.
+		if isinstance(sheet_name, str) and self._sheet_names is not None and sheet_name not in self._sheet_names:
+			raise ValueError(f"Worksheet named '{sheet_name}' not found")
+		with self.archive.open('content.xml') as f:
+			stack = list()
+			table_index = -1
+			in_sheet = False
+			row_index = 0
+			for event, elem in iterparse(f, events=('start', 'end')):
+				if event == 'start':
+					stack.append(elem)
+					if elem.tag == TABLE:
+						table_index += 1
+						in_sheet = sheet_name == table_index if isinstance(sheet_name, int) else sheet_name == elem.get(TABLE_NAME)
+					continue
+				stack.pop()
+				if elem.tag == TABLE:
+					if in_sheet:
+						return
+				elif elem.tag != TABLE_ROW:
+					continue
+				if in_sheet:
+					rows_repeated = int(elem.get(ROWS_REPEATED, 1))
+					cells = dict[int, object]()
+					column_index = 0
+					for cell in elem:
+						if cell.tag != TABLE_CELL and cell.tag != COVERED_TABLE_CELL:
+							continue
+						columns_repeated = int(cell.get(COLUMNS_REPEATED, 1))
+						if len(cell) > 0:
+							value = None
+							if cell.tag == TABLE_CELL and (columns is None or any(
+									i in columns for i in range(column_index, column_index + columns_repeated))):
+								value = _convert_cell(cell)
+							for i in range(column_index, column_index + columns_repeated):
+								cells[i] = value
+						column_index += columns_repeated
+					if cells:
+						for _ in range(rows_repeated):
+							yield row_index, cells
+							row_index += 1
+					else:
+						row_index += rows_repeated
+				if stack:
+					stack[-1].remove(elem)
+		if isinstance(sheet_name, int):
+			raise IndexError(f"Worksheet index {sheet_name} is invalid, {table_index + 1} worksheets found")
+		raise ValueError(f"Worksheet named '{sheet_name}' not found")
@@ -1,9 +1,45 @@
+import codecs
+import contextlib
+import copy
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator
+
 from straw.settings import DataSettings, FileSettings
 from straw.settings import Default as DefaultSettings
 import pandas as pd
+from pandas.api.types import union_categoricals
+from pandas.io.parsers import TextParser
 
-from straw.mapping import ColumnMapping
+from straw.cache import ReadCache
+from straw.mapping import ColumnMapping, ColumnMappingPlan
 from straw.df_transform import DataFrameTransformer
+from straw.ods_reader import OdsReader, is_ods
+from straw.sink import Sink, get_sink
+from straw.sniffer import Sniffer, get_header_line_count
+from straw.sources import BufferReader, get_compression, get_source, open_decompressed, read_prefix
+from straw.stats import ReadStats, get_source_size
+from straw.xlsx_reader import XlsxReader, is_xlsx
+
+
+SPREADSHEET_EXTENSIONS = ('.xlsx', '.xlsm', '.xls', '.ods')
+
+
+def _read_file(reader: 'TabularDataReader', path, sheet_name: str | int | list | None):
+	return reader.read_file(path, sheet_name)
+
+
+class _ColumnSelection:
+	# Every column until positions are set, the streaming sheet readers look it up for each cell.
+	def __init__(self):
+		self.positions: set[int] | None = None
+
+	def __contains__(self, column_index: int) -> bool:
+		return self.positions is None or column_index in self.positions
 
 
 class TabularDataReader:
@@ -11,15 +47,67 @@ class TabularDataReader:
 			self,
 			data_settings: DataSettings = DefaultSettings.DATA_SETTINGS,
 			file_settings: FileSettings = DefaultSettings.FILE_SETTINGS,
-			column_mappings: list[ColumnMapping] | None = None
+			column_mappings: list[ColumnMapping] | None = None,
+			cache: ReadCache | None = None,
+			sniffer: Sniffer | None = None,
+			stats: ReadStats | None = None,
+			row_filters: list[tuple[str, str, object] | Callable] | None = None
 	):
 		self.data_settings = data_settings
 		self.file_settings = file_settings
 		self.column_mappings = column_mappings
+		self.cache = cache
+		self.sniffer = sniffer if sniffer is not None else Sniffer()
+		self.stats = stats
+		# Applied to every chunk after columns are selected and converted, see DataFrameTransformer.row_filters.
+		# Filtered CSV reads are parsed in chunks, so only the matching rows are held.
+		self.row_filters = row_filters
+		self.transformer: DataFrameTransformer | None = None
+		# The settings, mappings and filters the transformer was built with, None ones included.
+		self._transformer_sources: tuple = ()
+		self._lock = threading.Lock()
+
+	def __getstate__(self) -> dict:
+		state = dict(self.__dict__)
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state: dict):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+
+	def get_transformer(self) -> DataFrameTransformer:
+		# The transformer is kept between reads so its compiled mapping plans are reused
+		# for files sharing a header layout. It is rebuilt when one of its sources is replaced, changes made in
+		# place are told apart by the plan cache key.
+		with self._lock:
+			transformer = self.transformer
+			sources = (self.data_settings, self.column_mappings, self.row_filters)
+			if transformer is None or any(x is not y for x, y in zip(sources, self._transformer_sources)):
+				transformer = DataFrameTransformer(column_mappings=self.column_mappings,
+												   data_settings=self.data_settings, stats=self.stats,
+												   row_filters=self.row_filters)
+				self.transformer = transformer
+				self._transformer_sources = sources
+			transformer.stats = self.stats
+			return transformer
+
+	def stage(
+			self, stage: str, rows: int | None = None, bytes_read: int | None = None
+	) -> contextlib.AbstractContextManager[dict]:
+		# Stages and scopes are recorded only when stats are kept, readers built on this one record theirs here too.
+		if self.stats is None:
+			return contextlib.nullcontext(dict())
+		return self.stats.stage(stage, rows, bytes_read)
+
+	def scope(self, source, sheet_name: str | int | None = None) -> contextlib.AbstractContextManager:
+		if self.stats is None:
+			return contextlib.nullcontext()
+		return self.stats.scope(source, sheet_name)
 
 	def transform(self, frames: pd.DataFrame | dict[str | int, pd.DataFrame]) -> pd.DataFrame | dict[
 		str | int, pd.DataFrame]:
-		transformer = DataFrameTransformer(column_mappings=self.column_mappings, data_settings=self.data_settings)
+		transformer = self.get_transformer()
 
 		if isinstance(frames, pd.DataFrame):
 			return transformer.transform(frames)
@@ -29,20 +117,523 @@ class TabularDataReader:
 			frames[frame_name] = transformer.transform(frame)
 		return frames
 
+	def _can_push_down(self, source=None) -> bool:
+		if not self.column_mappings:
+			return False
+		if not self.data_settings.remove_unwanted_columns and not any(m.target_datatype for m in self.column_mappings):
+			return False
+		if isinstance(self.file_settings.header, list):
+			return False
+		if source is None or isinstance(source, (str, os.PathLike)):
+			return True
+		return hasattr(source, 'seekable') and source.seekable()
+
+	@staticmethod
+	def _read_header(read: Callable, source, parameters: dict) -> pd.DataFrame:
+		position = None if isinstance(source, (str, os.PathLike)) else source.tell()
+		try:
+			return read(**parameters, nrows=0)
+		finally:
+			if position is not None:
+				source.seek(position)
+
+	def _push_down_csv(self, transformer: DataFrameTransformer, parameters: dict) -> ColumnMappingPlan | None:
+		source = parameters['filepath_or_buffer']
+		if not self._can_push_down(source):
+			return None
+		with self.stage('plan'):
+			header = self._read_header(pd.read_csv, source, parameters)
+			plan = transformer.get_plan(header.columns)
+		parameters.update(plan.get_parser_parameters())
+		return plan
+
+	def get_file_settings(self, filepath_or_buffer, compression: str | None = 'infer') -> FileSettings:
+		if not self.file_settings.auto_detect:
+			return self.file_settings
+		source = get_source(filepath_or_buffer)
+		if compression == 'infer':
+			compression = get_compression(source, self.file_settings.compression)
+		with self.stage('sniff'):
+			return self.sniffer.sniff_csv(source, self.file_settings, compression)
+
+	def get_csv_parameters(self, filepath_or_buffer) -> dict:
+		compression = get_compression(filepath_or_buffer, self.file_settings.compression)
+		file_settings = self.get_file_settings(filepath_or_buffer, compression)
+		parameters = {"filepath_or_buffer": filepath_or_buffer, "sep": file_settings.separator,
+					  'header': file_settings.header, 'quotechar': file_settings.quotechar, 'compression': compression}
+		if file_settings.encoding:
+			parameters['encoding'] = file_settings.encoding
+		if self.file_settings.memory_map and compression is None and isinstance(filepath_or_buffer, (str, os.PathLike)):
+			parameters['memory_map'] = True
+		if self.data_settings.dtype_backend:
+			parameters['dtype_backend'] = self.data_settings.dtype_backend
+		return parameters
+
+	def _get_cache_key(self, source, *parts) -> str | None:
+		if self.cache is None:
+			return None
+		if self.row_filters:
+			# Callables can not be told apart by name.
+			if any(callable(x) for x in self.row_filters):
+				return None
+			parts = (self.row_filters, *parts)
+		return self.cache.get_key(source, self.file_settings, self.data_settings, self.column_mappings, *parts)
+
+	def _cached(self, read: Callable, source, *parts):
+		key = self._get_cache_key(source, read.__name__, *parts)
+		if key is not None:
+			result = self.cache.get(key)
+			if result is not None:
+				return result
+		result = read(source, *parts)
+		if key is not None:
+			self.cache.put(key, result)
+		return result
+
 	def read_csv(
 			self,
 			filepath_or_buffer
 	) -> pd.DataFrame:
-		parameters = {"filepath_or_buffer": filepath_or_buffer, "sep": self.file_settings.separator,
-					  'header': self.file_settings.header}
-		df = pd.read_csv(**parameters)
-		df = self.transform(df)
+		return self._cached(self._read_csv, get_source(filepath_or_buffer))
+
+	def _read_csv(
+			self,
+			filepath_or_buffer
+	) -> pd.DataFrame:
+		with self.scope(filepath_or_buffer):
+			transformer = self.get_transformer()
+			if self.file_settings.engine == 'pyarrow':
+				# Tuple filters run in Arrow, callables expect the frame like with the pandas engine.
+				row_filters = self.row_filters or list()
+				table, plan = self._read_csv_table(filepath_or_buffer, transformer, [x for x in row_filters if not callable(x)])
+				with self.stage('to_pandas', table.num_rows):
+					df = table.to_pandas(types_mapper=pd.ArrowDtype if self.data_settings.dtype_backend == 'pyarrow' else None)
+				return transformer.convert(df, plan, [x for x in row_filters if callable(x)], owned=True)
+			if self.row_filters:
+				return self._concat_chunks(list(self.iter_csv(filepath_or_buffer)))
+			parameters = self.get_csv_parameters(filepath_or_buffer)
+			plan = self._push_down_csv(transformer, parameters)
+			with self.stage('parse', bytes_read=get_source_size(filepath_or_buffer)) as record:
+				df = pd.read_csv(**parameters)
+				record['rows'] = len(df)
+			df = transformer.transform(df, plan, owned=True)
+		return df
+
+	def _open_arrow_stream(self, source, compression: str | None) -> contextlib.AbstractContextManager:
+		# Buffers given by the caller are left open.
+		import pyarrow as pa
+		if isinstance(source, (str, os.PathLike)) and compression in (None, 'infer', 'gzip', 'bz2', 'zstd'):
+			# Arrow decompresses these itself, without holding the GIL.
+			path = os.path.expanduser(source)
+			if compression is None and self.file_settings.memory_map:
+				return pa.memory_map(path)
+			return pa.input_stream(path, compression='detect' if compression == 'infer' else compression)
+		if compression is None:
+			if isinstance(source, BufferReader):
+				return contextlib.nullcontext(pa.BufferReader(pa.py_buffer(source.buffer[source.tell():])))
+			return contextlib.nullcontext(source)
+		return open_decompressed(source, compression)
+
+	@staticmethod
+	def _get_header_line_count(source, parameters: dict) -> int:
+		# Lines Arrow has to skip to get past the header row, blank lines before it included.
+		header = parameters['header']
+		prefix = read_prefix(source, DefaultSettings.SNIFF_BYTES, parameters['compression'])
+		if not prefix:
+			return header + 1
+		text = prefix
+		if isinstance(prefix, bytes):
+			text = codecs.getincrementaldecoder(parameters.get('encoding') or 'utf-8')(errors='ignore').decode(prefix)
+		if len(prefix) >= DefaultSettings.SNIFF_BYTES:
+			# The last line may be cut off.
+			text = text[:text.rfind('\n') + 1]
+		count = get_header_line_count(text, parameters['sep'], parameters['quotechar'], header)
+		return count if count is not None else header + 1
+
+	def _read_csv_table(
+			self, filepath_or_buffer, transformer: DataFrameTransformer,
+			row_filters: list[tuple[str, str, object] | Callable] | None = None
+	) -> tuple:
+		from pyarrow import csv
+		parameters = self.get_csv_parameters(filepath_or_buffer)
+		header = parameters['header']
+		if isinstance(header, list):
+			raise ValueError("The pyarrow engine supports a single header row only")
+		# The header is read by pandas where possible, so both engines name blank and duplicate columns alike.
+		names = None
+		plan = None
+		if isinstance(filepath_or_buffer, (str, os.PathLike)) or (
+				hasattr(filepath_or_buffer, 'seekable') and filepath_or_buffer.seekable()):
+			with self.stage('plan'):
+				names = [str(x) for x in self._read_header(pd.read_csv, filepath_or_buffer, parameters).columns]
+				plan = transformer.get_plan(names)
+		skip_rows = header or 0
+		if names is not None and header is not None:
+			skip_rows = self._get_header_line_count(filepath_or_buffer, parameters)
+		read_options = csv.ReadOptions(
+			column_names=names, autogenerate_column_names=header is None and names is None, skip_rows=skip_rows,
+			encoding=parameters.get('encoding', 'utf8'))
+		parse_options = csv.ParseOptions(delimiter=parameters['sep'], quote_char=parameters['quotechar'])
+		convert_options = csv.ConvertOptions(strings_can_be_null=True)
+		if plan is not None and self._can_push_down(filepath_or_buffer):
+			for k, v in plan.get_arrow_convert_options(names).items():
+				setattr(convert_options, k, v)
+		with self.stage('parse', bytes_read=get_source_size(filepath_or_buffer)) as record:
+			with self._open_arrow_stream(filepath_or_buffer, parameters['compression']) as stream:
+				table = csv.read_csv(stream, read_options=read_options, parse_options=parse_options,
+									 convert_options=convert_options)
+			record['rows'] = table.num_rows
+		if plan is None:
+			plan = transformer.get_plan(table.column_names)
+		return transformer.transform_table(table, plan, row_filters), plan
+
+	def read_csv_table(self, filepath_or_buffer):
+		# Returns a pa.Table parsed by Arrow whatever the engine setting, with missing values as nulls.
+		source = get_source(filepath_or_buffer)
+		with self.scope(source):
+			table, _ = self._read_csv_table(source, self.get_transformer())
+		return table
+
+	@staticmethod
+	def _concat_chunks(frames: list[pd.DataFrame]) -> pd.DataFrame:
+		frames = [x for x in frames if len(x) > 0] or frames[:1]
+		if len(frames) == 1:
+			return frames[0]
+		df = pd.concat(frames)
+		# Chunks of a category column hold different categories, pandas would fall back to object.
+		for i in range(df.shape[1]):
+			if (all(isinstance(x.dtypes.iloc[i], pd.CategoricalDtype) for x in frames)
+					and not isinstance(df.dtypes.iloc[i], pd.CategoricalDtype)):
+				df.isetitem(i, union_categoricals([x.iloc[:, i] for x in frames], sort_categories=True))
 		return df
 
+	def iter_csv(
+			self,
+			filepath_or_buffer,
+			chunksize: int = DefaultSettings.CHUNKSIZE
+	) -> Iterator[pd.DataFrame]:
+		# Compressed sources are decompressed chunk by chunk.
+		filepath_or_buffer = get_source(filepath_or_buffer)
+		with self.scope(filepath_or_buffer):
+			transformer = self.get_transformer()
+			parameters = self.get_csv_parameters(filepath_or_buffer)
+			plan = self._push_down_csv(transformer, parameters)
+		with pd.read_csv(**parameters, chunksize=chunksize) as chunks:
+			if self.stats is not None:
+				chunks = self.stats.iter_stage('parse', chunks, filepath_or_buffer)
+			for chunk in chunks:
+				with self.scope(filepath_or_buffer):
+					if plan is None:
+						plan = transformer.get_plan(chunk.columns)
+					chunk = transformer.transform(chunk, plan, owned=True)
+				yield chunk
+
+	def get_csv_schema(self, filepath_or_buffer, nrows: int = DefaultSettings.SCHEMA_SAMPLE_ROWS) -> dict:
+		# Only the first nrows are read, with nrows=0 the schema comes from the header and declared datatypes.
+		filepath_or_buffer = get_source(filepath_or_buffer)
+		transformer = self.get_transformer()
+		parameters = self.get_csv_parameters(filepath_or_buffer)
+		plan = self._push_down_csv(transformer, parameters)
+		df = pd.read_csv(**parameters, nrows=nrows)
+		return transformer.get_schema(transformer.transform(df, plan, owned=True))
+
+	def _get_sheet_header(
+			self, workbook: pd.ExcelFile | XlsxReader | OdsReader, sheet_name: str | int
+	) -> int | list[int] | None:
+		if not self.file_settings.auto_detect:
+			return self.file_settings.header
+		if isinstance(workbook, pd.ExcelFile):
+			rows = workbook.parse(sheet_name, header=None, nrows=self.sniffer.sample_rows).values.tolist()
+		else:
+			rows = list[list]()
+			for row_index, cells in workbook.iter_rows(sheet_name):
+				if row_index >= self.sniffer.sample_rows:
+					break
+				rows.extend([] for _ in range(row_index - len(rows)))
+				rows.append(list(cells.values()))
+		return self.sniffer.sniff_header(rows)
+
+	def _read_sheet(
+			self, workbook: pd.ExcelFile, sheet_name: str | int, transformer: DataFrameTransformer
+	) -> pd.DataFrame:
+		parameters = {'sheet_name': sheet_name, 'header': self._get_sheet_header(workbook, sheet_name)}
+		if self.data_settings.dtype_backend:
+			parameters['dtype_backend'] = self.data_settings.dtype_backend
+		plan = None
+		if self._can_push_down():
+			with self.stage('plan'):
+				header = workbook.parse(**parameters, nrows=0)
+				plan = transformer.get_plan(header.columns)
+			# A mapping the header does not match may match an unnamed column of data wider than the header, the
+			# sheet is then parsed whole.
+			targets = {m.target_identifier for m in self.column_mappings if m.target_identifier}
+			if len(plan.wanted_column_names) < len(targets):
+				plan = None
+			else:
+				parameters.update(plan.get_parser_parameters(date_format=False, bool_types=False))
+		with self.stage('parse') as record:
+			df = workbook.parse(**parameters)
+			record['rows'] = len(df)
+		return transformer.transform(df, plan, owned=True)
+
 	def read_spreadsheet(
 			self, io, sheet_name: str | int | list | None = None
 	) -> pd.DataFrame | dict[str | int, pd.DataFrame]:
-		parameters = {"io": io, 'sheet_name': sheet_name, 'header': self.file_settings.header}
-		frames = pd.read_excel(**parameters)
-		frames = self.transform(frames)
-		return frames
+		return self._cached(self._read_spreadsheet, get_source(io), sheet_name)
+
+	def _read_spreadsheet(
+			self, io, sheet_name: str | int | list | None = None
+	) -> pd.DataFrame | dict[str | int, pd.DataFrame]:
+		if not isinstance(io, pd.ExcelFile) and not isinstance(self.file_settings.header, list) and is_ods(io):
+			with OdsReader(io) as workbook:
+				return self._read_sheets(workbook, sheet_name)
+		with contextlib.nullcontext(io) if isinstance(io, pd.ExcelFile) else pd.ExcelFile(io) as workbook:
+			return self._read_sheets(workbook, sheet_name)
+
+	def _read_sheets(
+			self, workbook: pd.ExcelFile | OdsReader, sheet_name: str | int | list | None
+	) -> pd.DataFrame | dict[str | int, pd.DataFrame]:
+		if sheet_name is None:
+			sheet_names = workbook.sheet_names
+		elif isinstance(sheet_name, list):
+			sheet_names = sheet_name
+		else:
+			return self.read_sheet(workbook, sheet_name)
+		return {x: self.read_sheet(workbook, x) for x in sheet_names}
+
+	def read_sheet(self, workbook: pd.ExcelFile | OdsReader, sheet_name: str | int = 0) -> pd.DataFrame:
+		# One sheet of an open workbook, parsed and transformed as a whole. ODS workbooks are streamed.
+		if isinstance(workbook, OdsReader):
+			return next(self.iter_sheet(workbook, sheet_name, None))
+		with self.scope(workbook.io, sheet_name):
+			return self._read_sheet(workbook, sheet_name, self.get_transformer())
+
+	@staticmethod
+	def _get_header_names(cells: dict[int, object], width: int = 0) -> list:
+		# Data cells beyond the header get unnamed columns like pandas gives them.
+		names = list()
+		seen = dict()
+		for i in range(max(max(cells.keys(), default=-1) + 1, width)):
+			name = cells.get(i)
+			if name is None or name == '':
+				name = f"Unnamed: {i}"
+			if name in seen:
+				# Duplicate names are mangled the same way pandas does.
+				seen[name] += 1
+				name = f"{name}.{seen[name]}"
+			else:
+				seen[name] = 0
+			names.append(name)
+		return names
+
+	def iter_sheet(
+			self, workbook: XlsxReader | OdsReader, sheet_name: str | int = 0,
+			chunksize: int | None = DefaultSettings.CHUNKSIZE
+	) -> Iterator[pd.DataFrame]:
+		# Without chunksize the whole sheet is returned as one frame.
+		header = self._get_sheet_header(workbook, sheet_name)
+		if isinstance(header, list):
+			raise ValueError("Streaming spreadsheets supports a single header row only")
+		chunksize = chunksize or sys.maxsize
+		transformer = self.get_transformer()
+		# The first chunk is converted whole, the rows after it only in the columns the plan keeps.
+		columns = _ColumnSelection()
+		rows = workbook.iter_rows(sheet_name, columns=columns)
+		header_cells = None
+		buffer = list[tuple[int, dict[int, object]]]()
+		for row in rows:
+			if header is not None and row[0] <= header:
+				if row[0] == header:
+					header_cells = row[1]
+				continue
+			buffer.append(row)
+			if len(buffer) >= chunksize:
+				break
+		# The width is taken from xlsx' <dimension> element, which may be out of date, and the first chunk. ODS does
+		# not record it, cells beyond the first chunk's width are left out when streaming.
+		width = max((max(cells.keys(), default=-1) + 1 for _, cells in buffer), default=0)
+		if isinstance(workbook, XlsxReader):
+			dimensions = workbook.get_dimensions(sheet_name)
+			if dimensions is not None:
+				width = max(width, dimensions[1])
+		if header is None:
+			names = list(range(width))
+		else:
+			names = self._get_header_names(header_cells or dict(), width)
+
+		plan = transformer.get_plan(names)
+		positions = plan.source_column_positions
+		if positions is None:
+			positions = list(range(len(names)))
+		columns.positions = set(positions)
+		parser_parameters = plan.get_parser_parameters(date_format=False, bool_types=False)
+		parser_parameters.pop('usecols', None)
+		if self.data_settings.dtype_backend:
+			parser_parameters['dtype_backend'] = self.data_settings.dtype_backend
+		selected_names = [names[i] for i in positions]
+
+		frames = self._iter_sheet_frames(itertools.chain(buffer, rows), positions, selected_names, parser_parameters,
+										 chunksize, 0 if header is None else header + 1)
+		source = workbook.archive.filename
+		if self.stats is not None:
+			frames = self.stats.iter_stage('parse', frames, source, sheet_name)
+		for df in frames:
+			with self.scope(source, sheet_name):
+				df = transformer.transform(df, plan, owned=True)
+			yield df
+
+	def _iter_sheet_frames(
+			self, rows: Iterator[tuple[int, dict[int, object]]], positions: list[int], names: list,
+			parser_parameters: dict, chunksize: int, next_row_index: int
+	) -> Iterator[pd.DataFrame]:
+		start = 0
+		chunk = list[list]()
+		empty_row = [''] * len(positions)
+		for row_index, cells in rows:
+			if not cells:
+				continue
+			# Empty rows are kept unless they are trailing, empty cells are passed as empty strings
+			# like pandas' excel readers do.
+			for _ in range(row_index - next_row_index):
+				chunk.append(empty_row)
+				if len(chunk) >= chunksize:
+					yield self._parse_sheet_rows(chunk, names, parser_parameters, start)
+					start += len(chunk)
+					chunk = list[list]()
+			chunk.append([cells.get(i, '') for i in positions])
+			next_row_index = row_index + 1
+			if len(chunk) >= chunksize:
+				yield self._parse_sheet_rows(chunk, names, parser_parameters, start)
+				start += len(chunk)
+				chunk = list[list]()
+		if chunk or start == 0:
+			yield self._parse_sheet_rows(chunk, names, parser_parameters, start)
+
+	@staticmethod
+	def _parse_sheet_rows(rows: list[list], names: list, parser_parameters: dict, start: int) -> pd.DataFrame:
+		# Rows empty in the kept columns are still rows, the empty ones of the sheet are dropped before.
+		index = pd.RangeIndex(start, start + len(rows))
+		if not names:
+			return pd.DataFrame(index=index)
+		df = TextParser(rows, names=names, header=None, skip_blank_lines=False, **parser_parameters).read()
+		df.index = index
+		return df
+
+	def iter_spreadsheet(
+			self, io, sheet_name: str | int = 0, chunksize: int = DefaultSettings.CHUNKSIZE
+	) -> Iterator[pd.DataFrame]:
+		io = get_source(io)
+		if not isinstance(self.file_settings.header, list) and is_ods(io):
+			with OdsReader(io) as workbook:
+				yield from self.iter_sheet(workbook, sheet_name, chunksize)
+			return
+		if not is_xlsx(io):
+			df = self.read_spreadsheet(io, sheet_name)
+			for start in range(0, max(len(df), 1), chunksize):
+				yield df.iloc[start:start + chunksize]
+			return
+		with XlsxReader(io) as workbook:
+			yield from self.iter_sheet(workbook, sheet_name, chunksize)
+
+	def get_spreadsheet_schema(
+			self, io, sheet_name: str | int = 0, nrows: int = DefaultSettings.SCHEMA_SAMPLE_ROWS
+	) -> dict:
+		# Sheets are streamed, so only the first chunk is parsed. Cell types are still taken from
+		# at least one row, spreadsheets have no untyped header-only read.
+		with contextlib.closing(self.iter_spreadsheet(io, sheet_name, max(nrows, 1))) as chunks:
+			df = next(chunks)
+		return DataFrameTransformer.get_schema(df.iloc[:nrows])
+
+	def _write_into(self, frames: Iterator[pd.DataFrame], sink, source, sheet_name: str | int | None = None) -> dict:
+		# A path gets a sink picked by its extension, which is closed when done. A given Sink is left open
+		# for more writes.
+		owned = not isinstance(sink, Sink)
+		if owned:
+			sink = get_sink(sink)
+		before = sink.get_summary()
+		start = time.perf_counter()
+		try:
+			with contextlib.closing(frames):
+				for df in frames:
+					with self.scope(source, sheet_name), self.stage('write', len(df)):
+						sink.write(df)
+		finally:
+			if owned:
+				sink.close()
+		# Counted for this read only, a given Sink may already hold earlier ones.
+		summary = {k: v - before[k] if v is not None and before[k] is not None else v for k, v in sink.get_summary().items()}
+		summary['total_seconds'] = time.perf_counter() - start
+		summary['rows_per_second'] = summary['rows_written'] / summary['total_seconds'] if summary['total_seconds'] else None
+		return summary
+
+	def _get_sink_reader(self) -> 'TabularDataReader':
+		# Sinks write NaN and None alike as null or an empty field, replacing NA would only cost an object copy.
+		if not self.data_settings.replace_na_with_none:
+			return self
+		reader = copy.copy(self)
+		reader.data_settings = copy.copy(self.data_settings)
+		reader.data_settings.replace_na_with_none = False
+		reader.transformer = None
+		return reader
+
+	def read_csv_into(self, filepath_or_buffer, sink: Sink | str | os.PathLike,
+					  chunksize: int = DefaultSettings.CHUNKSIZE) -> dict:
+		# Only one transformed chunk is held at a time. Returns rows, chunks and bytes written, the seconds spent
+		# writing and the rows per second of the whole read, transform and write.
+		filepath_or_buffer = get_source(filepath_or_buffer)
+		frames = self._get_sink_reader().iter_csv(filepath_or_buffer, chunksize)
+		return self._write_into(frames, sink, filepath_or_buffer)
+
+	def read_spreadsheet_into(self, io, sink: Sink | str | os.PathLike, sheet_name: str | int = 0,
+							  chunksize: int = DefaultSettings.CHUNKSIZE) -> dict:
+		io = get_source(io)
+		frames = self._get_sink_reader().iter_spreadsheet(io, sheet_name, chunksize)
+		return self._write_into(frames, sink, io, sheet_name)
+
+	def read_file(
+			self, path, sheet_name: str | int | list | None = 0
+	) -> pd.DataFrame | dict[str | int, pd.DataFrame]:
+		if str(path).lower().endswith(SPREADSHEET_EXTENSIONS):
+			return self.read_spreadsheet(path, sheet_name)
+		return self.read_csv(path)
+
+	def read_many(
+			self,
+			paths: Iterable,
+			workers: int | None = None,
+			sheet_name: str | int | list | None = 0,
+			concat: bool = False,
+			ordered: bool = True,
+			errors: dict | None = None
+	) -> dict[str, pd.DataFrame | dict[str | int, pd.DataFrame]] | pd.DataFrame:
+		# Failed files are collected in errors when it is given, otherwise the first failure is raised.
+		paths = list(paths)
+		results = dict()
+		if workers == 1:
+			for path in paths:
+				try:
+					results[path] = self.read_file(path, sheet_name)
+				except Exception as e:
+					if errors is None:
+						raise
+					errors[path] = e
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				futures = {executor.submit(_read_file, self, path, sheet_name): path for path in paths}
+				for future in as_completed(futures):
+					path = futures[future]
+					try:
+						results[path] = future.result()
+					except Exception as e:
+						if errors is None:
+							executor.shutdown(cancel_futures=True)
+							raise
+						errors[path] = e
+		if ordered:
+			results = {x: results[x] for x in paths if x in results}
+		if concat:
+			frames = list[pd.DataFrame]()
+			for result in results.values():
+				frames.extend(result.values() if isinstance(result, dict) else [result])
+			return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+		return results
@@ -2,17 +2,69 @@ from dataclasses import dataclass
 
 
 class DataSettings:
-	def __init__(self, replace_na_with_none: bool = True, remove_unwanted_columns: bool = True):
+	def __init__(
+			self,
+			replace_na_with_none: bool = True,
+			remove_unwanted_columns: bool = True,
+			downcast_numeric: bool = False,
+			category_threshold: float | None = None,
+			dtype_backend: str | None = None
+	):
 		self.replace_na_with_none = replace_na_with_none
 		self.remove_unwanted_columns = remove_unwanted_columns
+		self.downcast_numeric = downcast_numeric
+		# Maximum ratio of unique values to rows for a string column to be stored as category.
+		self.category_threshold = category_threshold
+		# 'numpy_nullable' or 'pyarrow' keeps missing values as pd.NA in typed columns,
+		# replace_na_with_none is then only applied to the output records.
+		self.dtype_backend = dtype_backend
 
 
 class FileSettings:
-	def __init__(self, separator: str = ',', header: int | list[int] | None = 0):
+	def __init__(
+			self,
+			separator: str = ',',
+			header: int | list[int] | None = 0,
+			encoding: str | None = None,
+			quotechar: str = '"',
+			auto_detect: bool = False,
+			compression: str | None = 'infer',
+			memory_map: bool = False,
+			engine: str | None = None
+	):
 		self.separator = separator
 		self.header = header
+		self.encoding = encoding
+		self.quotechar = quotechar
+		# Separator, header row, encoding and quote character are sniffed from the start of each file,
+		# the values above are only used when a file can not be sniffed.
+		self.auto_detect = auto_detect
+		# 'infer' detects gzip, zstd, bz2, xz and zip from the first bytes, also for buffers.
+		self.compression = compression
+		# Uncompressed files given by path are memory-mapped instead of read.
+		self.memory_map = memory_map
+		# 'pyarrow' parses whole files with Arrow's multithreaded CSV reader, None keeps pandas' C parser.
+		# Chunked reads and schema samples always use pandas. Arrow names the columns of files without
+		# header row '0', '1', ... instead of 0, 1, ...
+		self.engine = engine
 
 
 class Default:
 	DATA_SETTINGS = DataSettings()
 	FILE_SETTINGS = FileSettings()
+	CHUNKSIZE = 100_000
+	RECORD_BATCH_SIZE = 10_000
+	PLAN_CACHE_SIZE = 128
+	COLUMN_INDEX_THRESHOLD = 10_000
+	CACHE_MAX_BYTES = 1 << 30
+	SCHEMA_SAMPLE_ROWS = 1_000
+	SNIFF_BYTES = 64 * 1024
+	SNIFF_ROWS = 50
+	SNIFF_DELIMITERS = ',;\t|'
+	LAYOUT_CACHE_SIZE = 128
+	ASYNC_MAX_CONCURRENCY = 4
+	ASYNC_QUEUE_SIZE = 2
+	ASYNC_READ_SIZE = 1 << 20
+	STATS_MAX_RECORDS = 10_000
+	TAIL_HEAD_BYTES = 4096
+	TAIL_BLOCK_BYTES = 1 << 20
@@ -0,0 +1,162 @@
+import abc
+import os
+import time
+
+import pandas as pd
+
+
+class Sink(abc.ABC):
+	# Writes transformed chunks one at a time to a path or binary file object, only the chunk being written is
+	# held in memory. Paths are opened on the first write and closed with the sink, file objects are left open.
+	def __init__(self, where):
+		self.where = where
+		self.file = None
+		self.start_position = None
+		self.rows_written = 0
+		self.chunks_written = 0
+		self.seconds = 0.0
+		self.bytes_written = 0
+		self.closed = False
+
+	def _open(self):
+		if isinstance(self.where, (str, os.PathLike)):
+			self.file = open(self.where, 'wb')
+		else:
+			self.file = self.where
+		try:
+			self.start_position = self.file.tell()
+		except (AttributeError, OSError):
+			self.start_position = None
+
+	@abc.abstractmethod
+	def _write(self, df: pd.DataFrame):
+		pass
+
+	def _finish(self):
+		pass
+
+	def write(self, df: pd.DataFrame):
+		start = time.perf_counter()
+		if self.file is None:
+			self._open()
+		self._write(df)
+		self.rows_written += len(df)
+		self.chunks_written += 1
+		self.seconds += time.perf_counter() - start
+
+	def close(self):
+		if self.closed:
+			return
+		start = time.perf_counter()
+		if self.file is not None:
+			self._finish()
+			self.bytes_written = self._get_bytes_written()
+			if self.file is not self.where:
+				self.file.close()
+		self.closed = True
+		self.seconds += time.perf_counter() - start
+
+	def _get_bytes_written(self) -> int | None:
+		if self.file is None:
+			return 0
+		if self.start_position is None or self.file.closed:
+			return None
+		return self.file.tell() - self.start_position
+
+	def get_summary(self) -> dict:
+		# seconds is the time spent writing, the throughput of a whole read is reported by read_csv_into.
+		bytes_written = self.bytes_written if self.closed else self._get_bytes_written()
+		return {'rows_written': self.rows_written, 'chunks_written': self.chunks_written,
+				'bytes_written': bytes_written, 'seconds': self.seconds}
+
+	def __enter__(self) -> 'Sink':
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+
+class _ArrowSink(Sink):
+	# The schema is taken from the first chunk unless given, later chunks are converted to it.
+	def __init__(self, where, schema=None):
+		super().__init__(where)
+		self.schema = schema
+		self.writer = None
+
+	@abc.abstractmethod
+	def _new_writer(self, schema):
+		pass
+
+	def _write(self, df: pd.DataFrame):
+		import pyarrow as pa
+		try:
+			table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+		except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+			# E.g. a column that was empty in the first chunk, its type was guessed from no values.
+			raise ValueError(f"Chunk {self.chunks_written} does not match the schema of the first chunk, "
+							 f"pass the schema to the sink: {e}") from e
+		if self.writer is None:
+			self.schema = table.schema
+			self.writer = self._new_writer(self.schema)
+		self.writer.write_table(table)
+
+	def _finish(self):
+		if self.writer is not None:
+			self.writer.close()
+
+
+class ParquetSink(_ArrowSink):
+	# Every chunk is written as its own row group.
+	def __init__(self, where, schema=None, compression: str | None = 'snappy'):
+		super().__init__(where, schema)
+		self.compression = compression
+
+	def _new_writer(self, schema):
+		import pyarrow.parquet as pq
+		return pq.ParquetWriter(self.file, schema, compression=self.compression or 'none')
+
+
+class FeatherSink(_ArrowSink):
+	# Feather version 2, the Arrow IPC file format, with one record batch per chunk.
+	def __init__(self, where, schema=None, compression: str | None = 'lz4'):
+		super().__init__(where, schema)
+		self.compression = compression
+
+	def _new_writer(self, schema):
+		import pyarrow as pa
+		return pa.ipc.new_file(self.file, schema, options=pa.ipc.IpcWriteOptions(compression=self.compression))
+
+
+class CsvSink(Sink):
+	def __init__(self, where, separator: str = ',', encoding: str = 'utf-8'):
+		super().__init__(where)
+		self.separator = separator
+		self.encoding = encoding
+
+	def _write(self, df: pd.DataFrame):
+		# The header is written with the first chunk only.
+		self.file.write(df.to_csv(sep=self.separator, index=False, header=self.chunks_written == 0).encode(self.encoding))
+
+
+class JsonLinesSink(Sink):
+	def _write(self, df: pd.DataFrame):
+		if len(df) > 0:
+			self.file.write(df.to_json(orient='records', lines=True, date_format='iso').encode('utf-8'))
+
+
+SINK_EXTENSIONS = {
+	'.parquet': ParquetSink,
+	'.pq': ParquetSink,
+	'.feather': FeatherSink,
+	'.arrow': FeatherSink,
+	'.csv': CsvSink,
+	'.jsonl': JsonLinesSink,
+	'.ndjson': JsonLinesSink,
+}
+
+
+def get_sink(path) -> Sink:
+	extension = os.path.splitext(os.fspath(path))[1].lower()
+	if extension not in SINK_EXTENSIONS:
+		raise ValueError(f"No sink for file extension '{extension}', pass a Sink instead")
+	return SINK_EXTENSIONS[extension](path)
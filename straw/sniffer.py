@@ -0,0 +1,162 @@
+import codecs
+import copy
+import csv
+import datetime
+import io
+import itertools
+import threading
+from collections import OrderedDict
+
+from straw.settings import FileSettings
+from straw.settings import Default as DefaultSettings
+from straw.sources import read_prefix
+
+BOM_ENCODINGS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+
+
+def detect_encoding(prefix: bytes) -> str:
+	for bom, encoding in BOM_ENCODINGS:
+		if prefix.startswith(bom):
+			return encoding
+	for encoding in ('utf-8', 'cp1252'):
+		try:
+			# The prefix may end inside a multibyte character.
+			codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+			return encoding
+		except UnicodeDecodeError:
+			continue
+	return 'latin-1'
+
+
+def _is_empty(value) -> bool:
+	return value is None or value == '' or (isinstance(value, float) and value != value)
+
+
+def _is_value(value) -> bool:
+	# Numbers, dates and booleans mark a data row, a header row holds names only.
+	if isinstance(value, str):
+		try:
+			float(value)
+			return True
+		except ValueError:
+			return False
+	return isinstance(value, (int, float, datetime.date, datetime.time))
+
+
+def detect_header(rows: list[list]) -> int | None:
+	# The header is the first row with more than half of the columns filled, rows above it are a preamble.
+	counts = [sum(not _is_empty(x) for x in row) for row in rows]
+	most = max(counts, default=0)
+	if most == 0:
+		return 0
+	header = next(i for i, x in enumerate(counts) if x * 2 > most)
+	if any(_is_value(x) for x in rows[header] if not _is_empty(x)):
+		return None
+	return header
+
+
+def get_header_line_count(text: str, separator: str, quotechar: str, header: int) -> int | None:
+	# Physical lines up to the end of the header row. header counts non-blank rows like pandas does, Arrow's
+	# skip_rows counts blank lines too. None when text ends before the header row does.
+	reader = csv.reader(io.StringIO(text), delimiter=separator, quotechar=quotechar)
+	rows = 0
+	try:
+		for row in reader:
+			if row:
+				if rows == header:
+					return reader.line_num
+				rows += 1
+	except csv.Error:
+		pass
+	return None
+
+
+class Sniffer:
+	# Layouts found are kept by the leading lines up to the header, files starting with the same lines
+	# reuse them without sniffing again.
+	def __init__(
+			self,
+			sample_bytes: int = DefaultSettings.SNIFF_BYTES,
+			sample_rows: int = DefaultSettings.SNIFF_ROWS,
+			cache_size: int = DefaultSettings.LAYOUT_CACHE_SIZE
+	):
+		self.sample_bytes = sample_bytes
+		self.sample_rows = sample_rows
+		self.cache_size = cache_size
+		self.layouts = OrderedDict[bytes | str, FileSettings]()
+		self._lock = threading.Lock()
+
+	def __getstate__(self) -> dict:
+		state = dict(self.__dict__)
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state: dict):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+
+	def _get_layout(self, prefix: bytes | str) -> FileSettings | None:
+		with self._lock:
+			for key, file_settings in self.layouts.items():
+				if type(key) is type(prefix) and prefix.startswith(key):
+					self.layouts.move_to_end(key)
+					return file_settings
+		return None
+
+	def sniff_csv(
+			self, filepath_or_buffer, file_settings: FileSettings = DefaultSettings.FILE_SETTINGS,
+			compression: str | None = None
+	) -> FileSettings:
+		# Unsniffable sources, e.g. non-seekable streams, keep the given settings.
+		prefix = read_prefix(filepath_or_buffer, self.sample_bytes, compression)
+		if not prefix:
+			return file_settings
+		# The encoding is detected for every prefix, files sharing their header lines may differ after them.
+		encoding = detect_encoding(prefix) if isinstance(prefix, bytes) else None
+		layout = self._get_layout(prefix)
+		if layout is not None:
+			if layout.encoding != encoding:
+				layout = copy.copy(layout)
+				layout.encoding = encoding
+			return layout
+
+		text = prefix
+		if isinstance(prefix, bytes):
+			text = codecs.getincrementaldecoder(encoding)(errors='ignore').decode(prefix, final=False)
+		if len(prefix) >= self.sample_bytes and '\n' in text:
+			text = text[:text.rfind('\n') + 1]
+
+		separator = file_settings.separator
+		quotechar = file_settings.quotechar
+		try:
+			dialect = csv.Sniffer().sniff(text, delimiters=DefaultSettings.SNIFF_DELIMITERS)
+			separator = dialect.delimiter
+			quotechar = dialect.quotechar or quotechar
+		except csv.Error:
+			pass
+
+		# Blank lines are left out, pandas does not count them for the header row either.
+		rows = list[list]()
+		line_numbers = list[int]()
+		reader = csv.reader(io.StringIO(text), delimiter=separator, quotechar=quotechar)
+		try:
+			for row in itertools.islice(reader, self.sample_rows):
+				if row:
+					rows.append(row)
+					line_numbers.append(reader.line_num)
+		except csv.Error:
+			pass
+		header = detect_header(rows)
+		layout = FileSettings(separator=separator, header=header, encoding=encoding, quotechar=quotechar,
+							  compression=file_settings.compression, memory_map=file_settings.memory_map,
+							  engine=file_settings.engine)
+		if rows and self.cache_size > 0:
+			key = ''.join(io.StringIO(text).readlines()[:line_numbers[header or 0]])
+			with self._lock:
+				self.layouts[key.encode(encoding) if encoding else key] = layout
+				while len(self.layouts) > self.cache_size:
+					self.layouts.popitem(last=False)
+		return layout
+
+	def sniff_header(self, rows: list[list]) -> int | None:
+		return detect_header(rows[:self.sample_rows])
@@ -0,0 +1,110 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import zipfile
+
+MAGIC_NUMBERS = (
+	(b'\x1f\x8b', 'gzip'),
+	(b'\x28\xb5\x2f\xfd', 'zstd'),
+	(b'BZh', 'bz2'),
+	(b'\xfd7zXZ\x00', 'xz'),
+	(b'PK\x03\x04', 'zip'),
+)
+
+
+class BufferReader(io.RawIOBase):
+	# Reads a bytes-like object in place, io.BytesIO would copy a memoryview or bytearray first.
+	def __init__(self, buffer):
+		self.buffer = memoryview(buffer).cast('B')
+		self.position = 0
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return True
+
+	def readinto(self, b) -> int:
+		size = max(min(len(b), len(self.buffer) - self.position), 0)
+		b[:size] = self.buffer[self.position:self.position + size]
+		self.position += size
+		return size
+
+	def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+		if whence == io.SEEK_CUR:
+			offset += self.position
+		elif whence == io.SEEK_END:
+			offset += len(self.buffer)
+		if offset < 0:
+			raise ValueError(f"Negative seek position {offset}")
+		self.position = offset
+		return self.position
+
+	def tell(self) -> int:
+		return self.position
+
+
+def get_source(source):
+	# Bytes-like sources are read in place, everything else is passed on as is.
+	if isinstance(source, (bytes, bytearray, memoryview)):
+		return BufferReader(source)
+	return source
+
+
+def read_prefix(source, size: int, compression: str | None = None) -> bytes | str | None:
+	# Reads the start of a path or seekable buffer and rewinds it, decompressed when compression is given.
+	# None when the source can not be rewound or is not a local file, URLs are left to pandas.
+	if isinstance(source, (str, os.PathLike)):
+		source = os.path.expanduser(source)
+		if not os.path.isfile(source):
+			return None
+		with open_decompressed(source, compression) as f:
+			return f.read(size)
+	if not (hasattr(source, 'seekable') and source.seekable()):
+		return None
+	position = source.tell()
+	try:
+		if compression is None:
+			return source.read(size)
+		with open_decompressed(source, compression) as f:
+			return f.read(size)
+	finally:
+		source.seek(position)
+
+
+def open_decompressed(source, compression: str | None) -> io.IOBase:
+	# Buffers are left open when the returned file is closed.
+	if compression is None:
+		return open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+	if compression == 'gzip':
+		return gzip.open(source, 'rb')
+	if compression == 'bz2':
+		return bz2.open(source, 'rb')
+	if compression == 'xz':
+		return lzma.open(source, 'rb')
+	if compression == 'zip':
+		archive = zipfile.ZipFile(source)
+		return archive.open(archive.namelist()[0])
+	if compression == 'zstd':
+		import zstandard
+		if isinstance(source, (str, os.PathLike)):
+			return zstandard.open(source, 'rb')
+		return zstandard.ZstdDecompressor().stream_reader(source, closefd=False)
+	raise ValueError(f"Unrecognized compression type: {compression}")
+
+
+def get_compression(source, compression: str | None = 'infer') -> str | None:
+	# 'infer' looks at the magic number, pandas only infers it from the file extension. Paths that are not local
+	# files keep 'infer'.
+	if compression != 'infer':
+		return compression
+	prefix = read_prefix(source, 6)
+	if prefix is None and isinstance(source, (str, os.PathLike)):
+		return compression
+	if isinstance(prefix, bytes):
+		for magic_number, name in MAGIC_NUMBERS:
+			if prefix.startswith(magic_number):
+				return name
+	return None
@@ -0,0 +1,128 @@
+import contextlib
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator
+
+from straw.settings import Default as DefaultSettings
+
+_scope = contextvars.ContextVar('scope', default=(None, None))
+
+
+def get_rss() -> int | None:
+	# Current resident set size, statm is a single short read so it is cheap enough for every stage.
+	try:
+		with open('/proc/self/statm', 'rb') as f:
+			return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+	except (OSError, ValueError):
+		return None
+
+
+def get_source_name(source) -> str | None:
+	if source is None:
+		return None
+	if isinstance(source, (str, os.PathLike)):
+		return os.fspath(source)
+	return getattr(source, 'name', None) if isinstance(getattr(source, 'name', None), str) else type(source).__name__
+
+
+def get_source_size(source) -> int | None:
+	if isinstance(source, (str, os.PathLike)):
+		try:
+			return os.path.getsize(source)
+		except OSError:
+			return None
+	if isinstance(source, (bytes, bytearray, memoryview)):
+		return len(source)
+	return None
+
+
+class ReadStats:
+	# Every stage of a read is recorded as a plain dict: stage, source, sheet_name, seconds, rows, bytes_read
+	# and memory_delta, the change of RSS over the stage. Callbacks get each record as it is added, the last
+	# max_records are kept and per-stage totals are summed up.
+	def __init__(
+			self,
+			callbacks: Iterable[Callable[[dict], None]] | None = None,
+			max_records: int = DefaultSettings.STATS_MAX_RECORDS,
+			track_memory: bool = True
+	):
+		self.callbacks = list(callbacks) if callbacks is not None else list[Callable[[dict], None]]()
+		self.records = deque[dict](maxlen=max_records)
+		self.totals = dict[str, dict]()
+		self.track_memory = track_memory
+		self._lock = threading.Lock()
+
+	@staticmethod
+	@contextlib.contextmanager
+	def scope(source, sheet_name: str | int | None = None) -> Iterator[None]:
+		# Stages recorded in the scope, also by the transformer, are attributed to this file or sheet.
+		token = _scope.set((get_source_name(source), sheet_name))
+		try:
+			yield
+		finally:
+			_scope.reset(token)
+
+	@contextlib.contextmanager
+	def stage(self, stage: str, rows: int | None = None, bytes_read: int | None = None) -> Iterator[dict]:
+		# rows and bytes_read can also be set on the yielded record when they are known only afterwards.
+		source, sheet_name = _scope.get()
+		record = {'stage': stage, 'source': source, 'sheet_name': sheet_name, 'rows': rows, 'bytes_read': bytes_read}
+		memory = get_rss() if self.track_memory else None
+		start = time.perf_counter()
+		yield record
+		record['seconds'] = time.perf_counter() - start
+		record['memory_delta'] = get_rss() - memory if memory is not None else None
+		self.add(record)
+
+	def iter_stage(self, stage: str, frames: Iterator, source, sheet_name: str | int | None = None) -> Iterator:
+		# Records getting each frame from the iterator, e.g. parsing a chunk. The scope is only set while the
+		# iterator runs, the consumer may record other files between chunks.
+		scope = (get_source_name(source), sheet_name)
+		while True:
+			memory = get_rss() if self.track_memory else None
+			start = time.perf_counter()
+			token = _scope.set(scope)
+			try:
+				frame = next(frames, None)
+			finally:
+				_scope.reset(token)
+			if frame is None:
+				return
+			seconds = time.perf_counter() - start
+			self.add({'stage': stage, 'source': scope[0], 'sheet_name': sheet_name, 'rows': len(frame),
+					  'bytes_read': None, 'seconds': seconds,
+					  'memory_delta': get_rss() - memory if memory is not None else None})
+			yield frame
+
+	def __getstate__(self) -> dict:
+		# Copies sent to worker processes record there, their records do not come back.
+		state = dict(self.__dict__)
+		del state['_lock']
+		return state
+
+	def __setstate__(self, state: dict):
+		self.__dict__.update(state)
+		self._lock = threading.Lock()
+
+	def add(self, record: dict):
+		with self._lock:
+			self.records.append(record)
+			totals = self.totals.setdefault(record['stage'], {
+				'count': 0, 'seconds': 0.0, 'rows': 0, 'bytes_read': 0, 'memory_delta': 0})
+			totals['count'] += 1
+			for key in ('seconds', 'rows', 'bytes_read', 'memory_delta'):
+				totals[key] += record[key] or 0
+		for callback in self.callbacks:
+			callback(record)
+
+	def get_summary(self) -> dict[str, dict]:
+		with self._lock:
+			return {k: dict(v) for k, v in self.totals.items()}
+
+	def clear(self):
+		with self._lock:
+			self.records.clear()
+			self.totals.clear()
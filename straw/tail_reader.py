@@ -0,0 +1,191 @@
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+
+import pandas as pd
+
+from straw.reader import TabularDataReader
+from straw.settings import Default as DefaultSettings
+from straw.sources import BufferReader, get_compression
+
+
+class TailCheckpoint:
+	# Where the last poll stopped. Plain values only, to_dict() can be stored as JSON and read back with
+	# from_dict() after a restart.
+	def __init__(
+			self,
+			offset: int = 0,
+			header: list | None = None,
+			header_end: int = 0,
+			inode: int | None = None,
+			device: int | None = None,
+			size: int = 0,
+			rows: int = 0,
+			head_digest: str | None = None
+	):
+		# Byte offset after the last complete line read.
+		self.offset = offset
+		# Column names of the file and the offset after its header lines.
+		self.header = header
+		self.header_end = header_end
+		self.inode = inode
+		self.device = device
+		self.size = size
+		# Data rows read so far, the next frame's index starts here.
+		self.rows = rows
+		# Digest of the first bytes already read, a file rewritten in place has other first bytes.
+		self.head_digest = head_digest
+
+	def to_dict(self) -> dict:
+		return dict(vars(self))
+
+	@staticmethod
+	def from_dict(d: dict) -> 'TailCheckpoint':
+		return TailCheckpoint(**d)
+
+
+def _get_head_digest(f, offset: int) -> str:
+	f.seek(0)
+	return hashlib.sha256(f.read(min(offset, DefaultSettings.TAIL_HEAD_BYTES))).hexdigest()
+
+
+def _count(data, sub: bytes, start: int, end: int) -> int:
+	# In blocks, slicing a memory-mapped file copies.
+	return sum(data[i:min(i + DefaultSettings.TAIL_BLOCK_BYTES, end)].count(sub)
+			   for i in range(start, end, DefaultSettings.TAIL_BLOCK_BYTES))
+
+
+def find_line_end(data, quotechar: str = '"', start: int = 0, last: bool = True) -> int:
+	# Offset after the last (or first) newline from start on that is not inside a quoted field, start when there
+	# is none. A newline is outside quotes when the number of quote characters before it is even, escaped quotes
+	# are doubled and do not change the parity. data is bytes or a memory-mapped file.
+	quote = quotechar.encode()
+	if not last:
+		i = start
+		quotes = 0
+		while (end := data.find(b'\n', i)) != -1:
+			quotes += _count(data, quote, i, end)
+			if quotes % 2 == 0:
+				return end + 1
+			i = end + 1
+		return start
+	end = data.rfind(b'\n', start)
+	if end == -1:
+		return start
+	quotes = _count(data, quote, start, end)
+	while quotes % 2 != 0:
+		previous = data.rfind(b'\n', start, end)
+		if previous == -1:
+			return start
+		quotes -= _count(data, quote, previous, end)
+		end = previous
+	return end + 1
+
+
+class TailReader:
+	# Reads a CSV file that is appended to, each poll parses and transforms only the complete lines added since
+	# the last one. The header and its mapping plan are resolved once. When the file is truncated, replaced
+	# or rewritten, reading starts over from its beginning and reset_reason tells why.
+	def __init__(self, reader: TabularDataReader, path, checkpoint: TailCheckpoint | None = None):
+		self.reader = reader
+		self.path = path
+		self.checkpoint = checkpoint if checkpoint is not None else TailCheckpoint()
+		self.reset_reason: str | None = None
+		self.parameters: dict | None = None
+
+	def _get_reset_reason(self, f, stat: os.stat_result) -> str | None:
+		checkpoint = self.checkpoint
+		if checkpoint.header is None:
+			return None
+		if (checkpoint.inode, checkpoint.device) != (stat.st_ino, stat.st_dev):
+			return 'rotated'
+		if stat.st_size < checkpoint.offset:
+			return 'truncated'
+		if _get_head_digest(f, checkpoint.offset) != checkpoint.head_digest:
+			return 'rewritten'
+		return None
+
+	def _read_header(self, f, parameters: dict) -> tuple[list, int] | None:
+		# Column names and the offset after the header lines, None while they are not complete.
+		# Preamble and header lines are counted like pandas does, blank lines are skipped.
+		header = parameters['header']
+		if isinstance(header, list):
+			raise ValueError("Tail reading supports a single header row only")
+		f.seek(0)
+		data = f.read(DefaultSettings.SNIFF_BYTES)
+		header_end = 0
+		lines = 0
+		# Without header the first line is needed for the column count.
+		while lines <= (header or 0):
+			line_end = find_line_end(data, parameters['quotechar'], header_end, last=False)
+			if line_end == header_end:
+				more = f.read(DefaultSettings.SNIFF_BYTES)
+				if not more:
+					return None
+				data += more
+				continue
+			if data[header_end:line_end].strip():
+				lines += 1
+			header_end = line_end
+		names = list(pd.read_csv(io.BytesIO(data[:header_end]), **parameters, nrows=0).columns)
+		return names, header_end if header is not None else 0
+
+	def _get_parameters(self) -> dict:
+		if get_compression(self.path, self.reader.file_settings.compression) not in (None, 'infer'):
+			raise ValueError("Compressed files can not be tail read")
+		parameters = self.reader.get_csv_parameters(self.path)
+		for k in ('filepath_or_buffer', 'compression', 'memory_map'):
+			parameters.pop(k, None)
+		return parameters
+
+	def poll(self) -> pd.DataFrame:
+		# Returns the transformed new rows, an empty frame when no complete line was added.
+		reader = self.reader
+		transformer = reader.get_transformer()
+		with open(self.path, 'rb') as f:
+			stat = os.fstat(f.fileno())
+			self.reset_reason = self._get_reset_reason(f, stat)
+			if self.reset_reason is not None:
+				self.checkpoint = TailCheckpoint()
+				self.parameters = None
+			checkpoint = self.checkpoint
+			if self.parameters is None or checkpoint.header is None:
+				# Sniffed until the header is complete, not on every poll.
+				self.parameters = self._get_parameters()
+			parameters = dict(self.parameters)
+			if checkpoint.header is None:
+				header = self._read_header(f, parameters)
+				if header is None:
+					return pd.DataFrame()
+				checkpoint.header, checkpoint.header_end = header
+				checkpoint.offset = checkpoint.header_end
+				checkpoint.inode, checkpoint.device = stat.st_ino, stat.st_dev
+			start = checkpoint.offset
+			with contextlib.ExitStack() as stack:
+				# The new lines are parsed from the mapped file, not copied into memory first.
+				data = b''
+				if stat.st_size > start:
+					data = stack.enter_context(mmap.mmap(f.fileno(), stat.st_size, access=mmap.ACCESS_READ))
+				end = find_line_end(data, parameters['quotechar'], start)
+				with reader.scope(self.path):
+					plan = transformer.get_plan(checkpoint.header)
+					parameters.update(header=None, names=checkpoint.header)
+					parameters.update(plan.get_parser_parameters())
+					with reader.stage('parse', bytes_read=end - start) as record:
+						with memoryview(data) as view, view[start:end] as lines:
+							source = BufferReader(lines)
+							try:
+								df = pd.read_csv(source, **parameters)
+							finally:
+								source.buffer.release()
+						record['rows'] = len(df)
+			checkpoint.offset = end
+			checkpoint.size = stat.st_size
+			checkpoint.head_digest = _get_head_digest(f, checkpoint.offset)
+
+		with reader.scope(self.path):
+			df.index = pd.RangeIndex(checkpoint.rows, checkpoint.rows + len(df))
+			checkpoint.rows += len(df)
+			return transformer.transform(df, plan, owned=True)
@@ -1,3 +1,13 @@
+import asyncio
+import bz2
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import zipfile
 from pprint import pprint, PrettyPrinter
 from typing import Callable
 
@@ -5,10 +15,20 @@ import numpy as np
 import pandas as pd
 from benedict import benedict
 
+from straw import bench
+from straw.async_reader import AsyncTabularDataReader
+from straw.cache import MANIFEST_FILE_NAME, ReadCache
+from straw.column_index import ColumnIndex
 from straw.df_transform import DataFrameTransformer
 from straw.reader import TabularDataReader
 from straw.settings import DataSettings, FileSettings
 from straw.settings import Default as DefaultSettings
+from straw.sink import ParquetSink, Sink
+from straw.sniffer import Sniffer
+from straw.sources import get_compression
+from straw.stats import ReadStats
+from straw.tail_reader import TailCheckpoint, TailReader
+from straw.workbook import Workbook
 from straw.mapping import ColumnMapping
 source_identifier_starts_with = ColumnMapping.source_identifier_starts_with
 source_identifier_ends_with = ColumnMapping.source_identifier_ends_with
@@ -115,6 +135,41 @@ def test_read_transform_rename_source_identifier_functions() -> bool:
 	return True
 
 
+def _get_random_column_mapping(rng: random.Random, column_names: list[str]) -> ColumnMapping:
+	name = rng.choice(column_names) if column_names and rng.random() < 0.7 else f"Col_{rng.randint(0, 9)}"
+	part = name[rng.randint(0, len(name)):rng.randint(0, len(name))] or name[:2]
+	target = rng.choice([None, f"col_{rng.randint(0, 9)}", f"target_{rng.randint(0, 9)}"])
+	source_identifier = rng.choice([
+		rng.randint(0, len(column_names) + 1), name, name.upper(), source_identifier_starts_with(part),
+		source_identifier_ends_with(part), source_identifier_contains(part), (lambda x, y: x > y, part)])
+	return ColumnMapping(source_identifier, target_identifier=target, name_is_case_sensitive=rng.random() < 0.5)
+
+
+def test_read_transform_rename_column_index():
+	# The index has to find the same first match as the column scan, renames included.
+	rng = random.Random(0)
+	for _ in range(500):
+		column_names = [f"{rng.choice(['col', 'Col', 'x', 'sensor'])}_{rng.randint(0, 9)}" for _ in range(rng.randint(0, 20))]
+		transformer = DataFrameTransformer([_get_random_column_mapping(rng, column_names) for _ in range(rng.randint(0, 20))])
+		index = ColumnIndex(column_names)
+		renamed_column_names = list(column_names)
+		for mapping in transformer.column_mappings:
+			expected = transformer._get_first_matching_column_name(renamed_column_names, mapping.source_identifier,
+																   mapping.name_is_case_sensitive)
+			assert index.find(mapping.source_identifier, mapping.name_is_case_sensitive) == expected, "Other column found"
+			if expected and mapping.target_identifier:
+				index.rename(expected, mapping.target_identifier)
+				renamed_column_names = [mapping.target_identifier if x == expected else x for x in renamed_column_names]
+			assert index.names == renamed_column_names, "Renames differ"
+	column_names = [f"sensor_{i}" for i in range(200)]
+	column_mappings = [ColumnMapping(source_identifier_ends_with(f"_{i}"), target_identifier=f"s{i}") for i in range(100)]
+	column_mappings.append(ColumnMapping(source_identifier_contains('SOR_1'), target_identifier="first", name_is_case_sensitive=False))
+	transformer = DataFrameTransformer(column_mappings)
+	plan = transformer.compile_plan(column_names)
+	assert plan.column_renames['sensor_5'] == 's5' and plan.column_renames['sensor_100'] == 'first', "Wrong renames"
+	return True
+
+
 def test_read_transform_rename_replace_na_with_none():
 	reader = TabularDataReader()
 	df = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
@@ -133,6 +188,110 @@ def test_read_transform_rename_do_not_replace_na_with_none():
 	return True
 
 
+def test_iter_csv():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(0, target_identifier="person_id"))
+	column_mappings.append(ColumnMapping(source_identifier_ends_with('day'), target_identifier="birth_day"))
+	column_mappings.append(ColumnMapping("comment", target_identifier="comment"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	chunks = list(reader.iter_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv", chunksize=1))
+	for chunk in chunks:
+		print(chunk)
+	assert len(chunks) == 3, "File not read in chunks"
+	assert all(list(chunk.columns) == ["person_id", "birth_day", "comment"] for chunk in chunks), "Chunk columns differ"
+	df = pd.concat(chunks, ignore_index=True)
+	df.info()
+	assert df.equals(reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")), "Chunks differ from read_csv"
+	return True
+
+
+def test_iter_spreadsheet_xlsx():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(0, target_identifier="person_id"))
+	column_mappings.append(ColumnMapping(source_identifier_ends_with('day'), target_identifier="birth_day"))
+	column_mappings.append(ColumnMapping("isFemale", target_identifier="is_female"))
+	column_mappings.append(ColumnMapping("comment", target_identifier="comment"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	chunks = list(reader.iter_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1', chunksize=2))
+	for chunk in chunks:
+		print(chunk)
+	assert len(chunks) == 2, "Sheet not read in chunks"
+	df = pd.concat(chunks)
+	df.info()
+	assert df.equals(reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')), "Chunks differ from read_spreadsheet"
+	return True
+
+
+def test_iter_spreadsheet_xlsx_header():
+	reader = TabularDataReader(file_settings=FileSettings(header=1))
+	df = pd.concat(reader.iter_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample06.xlsx", 0, chunksize=2))
+	print(df)
+	assert df.equals(reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample06.xlsx", 0)), "Chunks differ from read_spreadsheet"
+	return True
+
+
+def test_iter_spreadsheet_xlsx_no_header():
+	# The last row is wider than the first chunk.
+	buffer = io.BytesIO()
+	pd.DataFrame([[i, f"x{i}", None] for i in range(10)] + [[10, "x10", "wide"]]).to_excel(
+		buffer, index=False, header=False)
+	reader = TabularDataReader(file_settings=FileSettings(header=None))
+	chunks = list(reader.iter_spreadsheet(io.BytesIO(buffer.getvalue()), 0, chunksize=5))
+	print([x.shape for x in chunks])
+	assert [x.shape for x in chunks] == [(5, 3), (5, 3), (1, 3)], "Columns beyond the first chunk left out"
+	df = pd.concat(chunks)
+	assert df.iloc[10, 2] == "wide", "Cell beyond the first chunk left out"
+	assert df.equals(reader.read_spreadsheet(io.BytesIO(buffer.getvalue()), 0)), "Chunks differ from read_spreadsheet"
+	return True
+
+
+def test_iter_spreadsheet_xlsx_projection():
+	# Rows empty in the kept column stay, data wider than the header gets unnamed columns, also beyond the first
+	# chunk, and a projection keeping no column keeps the row count.
+	buffer = io.BytesIO()
+	pd.DataFrame([['a', 'b', 'c', None], [1, None, None, None], [2, None, 'x', None], [3, 'y', None, 'wide']]).to_excel(
+		buffer, index=False, header=False)
+	path = io.BytesIO(buffer.getvalue())
+	reader = TabularDataReader(column_mappings=[ColumnMapping('b', target_identifier="B")])
+	df = pd.concat(reader.iter_spreadsheet(path, 0, chunksize=2))
+	print(df)
+	assert df['B'].tolist() == [None, None, 'y'], "Rows empty in the kept column lost"
+	reader = TabularDataReader()
+	df = pd.concat(reader.iter_spreadsheet(path, 0, chunksize=2))
+	print(df)
+	assert list(df.columns) == ['a', 'b', 'c', 'Unnamed: 3'], "Cells beyond the header left out"
+	assert df.equals(reader.transform(pd.read_excel(path, 0))), "Chunks differ from read_excel"
+	reader = TabularDataReader(column_mappings=[ColumnMapping('missing', target_identifier="m")])
+	df = pd.concat(reader.iter_spreadsheet(path, 0, chunksize=2))
+	assert df.shape == (3, 0), "Row count lost without kept columns"
+	return True
+
+
+def test_iter_spreadsheet_ods():
+	reader = TabularDataReader(data_settings=DataSettings(replace_na_with_none=False))
+	chunks = list(reader.iter_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet2', chunksize=2))
+	for chunk in chunks:
+		print(chunk)
+	assert len(chunks) == 3, "Sheet not read in chunks"
+	df = pd.concat(chunks)
+	assert df.equals(pd.read_excel(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet2', engine='odf')), "Chunks differ from read_excel"
+	return True
+
+
+def test_read_spreadsheet_ods_native():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(source_identifier_ends_with('day'), target_identifier="birth_day"))
+	column_mappings.append(ColumnMapping(0, target_identifier="person_id"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	spreadsheet = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods")
+	pprint(spreadsheet)
+	expected = pd.read_excel(f"{TEST_DATA_DIRECTORY}/sample04.ods", sheet_name=None, engine='odf')
+	assert list(spreadsheet.keys()) == list(expected.keys()), "Sheets differ from read_excel"
+	for sheet_name, sheet in spreadsheet.items():
+		assert sheet.equals(reader.transform(expected[sheet_name])), f"Sheet {sheet_name} differs from read_excel"
+	return True
+
+
 def _read_spreadsheet(path: str, sheet_name: str | int | list | None = None) -> pd.DataFrame | dict[str | int, pd.DataFrame]:
 	reader = TabularDataReader()
 	spreadsheet = reader.read_spreadsheet(path, sheet_name)
@@ -147,6 +306,32 @@ def _read_spreadsheet(path: str, sheet_name: str | int | list | None = None) ->
 	return spreadsheet
 
 
+def test_read_spreadsheet_ods_projection():
+	# Rows empty in the kept columns are kept, as is the row count when no column is kept.
+	path = f"{TEST_DATA_DIRECTORY}/sample04.ods"
+	for column_mappings in [[ColumnMapping('comment', target_identifier="c")], [ColumnMapping('missing', target_identifier="m")]]:
+		reader = TabularDataReader(column_mappings=column_mappings)
+		df = reader.read_spreadsheet(path, 'sheet1')
+		print(df)
+		expected = reader.transform(pd.read_excel(path, 'sheet1', engine='odf'))
+		assert df.shape == expected.shape and list(df.index) == list(expected.index), "Rows lost"
+		assert df.equals(expected), "Values differ from read_excel"
+	return True
+
+
+def test_read_spreadsheet_ods_wide_rows():
+	# Data cells beyond the header row get unnamed columns.
+	buffer = io.BytesIO()
+	pd.DataFrame([['a', 'b', None], [1, None, None], [2, 'x', 'wide']]).to_excel(
+		buffer, index=False, header=False, engine='odf')
+	df = TabularDataReader().read_spreadsheet(io.BytesIO(buffer.getvalue()), 0)
+	print(df)
+	expected = TabularDataReader().transform(pd.read_excel(io.BytesIO(buffer.getvalue()), 0, engine='odf'))
+	assert list(df.columns) == ['a', 'b', 'Unnamed: 2'], "Wide cells left out"
+	assert df.equals(expected), "Values differ from read_excel"
+	return True
+
+
 def test_read_spreadsheet_ods():
 	spreadsheet: dict[str, pd.DataFrame] = _read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods")
 	assert isinstance(spreadsheet, dict), "Spreadsheet is not a dict"
@@ -187,6 +372,20 @@ def test_read_spreadsheet_excel():
 	return True
 
 
+def test_read_spreadsheet_excel_wide_rows():
+	# A mapping to a column of data wider than the header is not projected away.
+	buffer = io.BytesIO()
+	pd.DataFrame([['a', 'b', None], [1, 'x', None], [2, 'y', 'wide']]).to_excel(buffer, index=False, header=False)
+	path = io.BytesIO(buffer.getvalue())
+	reader = TabularDataReader(column_mappings=[ColumnMapping('a', target_identifier="A"),
+												 ColumnMapping('Unnamed: 2', target_identifier="w")])
+	df = reader.read_spreadsheet(path, 0)
+	print(df)
+	assert df['w'].tolist() == [None, 'wide'], "Column beyond the header left out"
+	assert df.equals(reader.transform(pd.read_excel(path, 0))), "Values differ from read_excel"
+	return True
+
+
 def test_read_spreadsheet_excel_one_sheet_by_position():
 	spreadsheet: pd.DataFrame = _read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 1)
 	assert isinstance(spreadsheet, pd.DataFrame), "Spreadsheet is not a data frame"
@@ -222,11 +421,64 @@ def test_to_list_of_dict():
 	return True
 
 
+def test_iter_records():
+	reader = TabularDataReader(data_settings=DataSettings(dtype_backend='numpy_nullable'))
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet1')
+	transformer = reader.get_transformer()
+	batches = list(transformer.iter_records(df, batch_size=2))
+	pprint(batches)
+	assert [len(x) for x in batches] == [2, 1], "Records not batched"
+	assert [x for batch in batches for x in batch] == transformer.to_records(df), "Batched records differ"
+	assert batches[0][0]["comment"] is None, "NA not replaced with None"
+	return True
+
+
+def test_to_columns():
+	df = pd.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	transformer = DataFrameTransformer()
+	columns = transformer.to_columns(df)
+	pprint(columns)
+	assert columns["comment"] == [None, None, "nice, and small"], "NA not replaced with None"
+	assert columns["ID"] == [15, 16, 17], "Wrong values"
+	arrays = DataFrameTransformer(data_settings=DataSettings(replace_na_with_none=False)).to_columns(df, as_arrays=True)
+	assert isinstance(arrays["height"], np.ndarray), "Not converted to arrays"
+	assert pd.isna(arrays["comment"][0]) and arrays["comment"][0] is not None, "NA replaced"
+	return True
+
+
 def test_get_schema():
 	spreadsheet: pd.DataFrame = _read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet1')
 	x = DataFrameTransformer.get_schema(spreadsheet)
 	pp = PrettyPrinter(depth=4)
 	pp.pprint(x)
+	assert x == json.loads(spreadsheet.to_json(orient="table")).get('schema'), "Schema differs from to_json"
+	return True
+
+
+def _get_schema_types(schema: dict) -> dict:
+	return {x['name']: x['type'] for x in schema['fields']}
+
+
+def test_get_schema_sample():
+	# Category enums only list the sampled values, the field types match the full read.
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	x = reader.get_csv_schema(f"{TEST_DATA_DIRECTORY}/sample01.csv", nrows=2)
+	pprint(x)
+	df = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	assert _get_schema_types(x) == _get_schema_types(DataFrameTransformer.get_schema(df)), "Schema differs"
+	x = reader.get_spreadsheet_schema(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1', nrows=2)
+	pprint(x)
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')
+	assert _get_schema_types(x) == _get_schema_types(DataFrameTransformer.get_schema(df)), "Schema differs"
+	return True
+
+
+def test_get_schema_header():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	x = reader.get_csv_schema(f"{TEST_DATA_DIRECTORY}/sample01.csv", nrows=0)
+	pprint(x)
+	assert _get_schema_types(x) == {'index': 'integer', 'person_id': 'integer', 'name': 'any', 'birth_day': 'datetime',
+					 'is_female': 'boolean', 'height': 'number', 'comment': 'string'}, "Wrong types"
 	return True
 
 
@@ -272,6 +524,797 @@ def test_remove_unwanted_columns_no_column_mapping():
 	return True
 
 
+def test_column_push_down_csv():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(4, target_identifier="height"))
+	column_mappings.append(ColumnMapping("name", target_identifier="person_name"))
+	column_mappings.append(ColumnMapping(1, target_identifier="person_name_again"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv") as f:
+		df = reader.read_csv(f)
+	print(df)
+	df.info()
+	assert list(df.columns) == ["height", "person_name_again"], "Unexpected columns"
+	assert df["height"].tolist() == [5.77, 6.01, 5.1], "Wrong column projected"
+	return True
+
+
+def test_column_push_down_spreadsheet():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping("comment", target_identifier="_comment"))
+	column_mappings.append(ColumnMapping(0, target_identifier="person_id"))
+	reader = TabularDataReader(file_settings=FileSettings(header=1), column_mappings=column_mappings)
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample06.xlsx", 0)
+	print(df)
+	df.info()
+	assert list(df.columns) == ["_comment", "person_id"], "Unexpected columns"
+	assert df["person_id"].tolist() == [15, 16, 17], "Wrong column projected"
+	return True
+
+
+def test_plan_cache():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(0, target_identifier="person_id"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet2')
+	print(df)
+	transformer = reader.get_transformer()
+	print(f"hits: {transformer.plan_cache_hits}, misses: {transformer.plan_cache_misses}")
+	assert transformer.plan_cache_hits == 1, "Plan not reused for the same header"
+	assert transformer.plan_cache_misses == 2, "Plan reused for a different header"
+	return True
+
+
+def test_plan_cache_changes():
+	# Mappings and settings changed in place between reads are not served stale plans.
+	column_mappings = [ColumnMapping(0, target_identifier="person_id")]
+	data_settings = DataSettings()
+	reader = TabularDataReader(column_mappings=column_mappings, data_settings=data_settings)
+	path = f"{TEST_DATA_DIRECTORY}/sample01.csv"
+	assert list(reader.read_csv(path).columns) == ["person_id"], "Wrong columns"
+	reader.column_mappings.append(ColumnMapping("name", target_identifier="n"))
+	assert list(reader.read_csv(path).columns) == ["person_id", "n"], "Appended mapping left out"
+	reader.data_settings.remove_unwanted_columns = False
+	df = reader.read_csv(path)
+	print(df)
+	assert len(df.columns) > 2 and list(df.columns[:2]) == ["person_id", "n"], "Unwanted columns removed"
+	assert reader.get_transformer().plan_cache_misses == 3, "Plan reused after a change"
+	reader.read_csv(path)
+	assert reader.get_transformer().plan_cache_hits == 1, "Plan not reused without a change"
+	return True
+
+
+def test_plan_cache_eviction():
+	transformer = DataFrameTransformer(column_mappings=[ColumnMapping("a", target_identifier="x")], plan_cache_size=1)
+	transformer.get_plan(["a", "b"])
+	transformer.get_plan(["a", "c"])
+	transformer.get_plan(["a", "c"])
+	transformer.get_plan(["a", "b"])
+	assert [x[0] for x in transformer.plan_cache.keys()] == [("a", "b")], "Least recently used plan not evicted"
+	assert transformer.plan_cache_misses == 3, "Evicted plan reused"
+	return True
+
+
+def _get_typed_column_mappings() -> list[ColumnMapping]:
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping("ID", target_identifier="person_id", target_datatype="int16"))
+	column_mappings.append(ColumnMapping("name", target_identifier="name", target_datatype="category"))
+	column_mappings.append(ColumnMapping("bday", target_identifier="birth_day", target_datatype="datetime64[ns]", datetime_format="%Y-%m-%d"))
+	column_mappings.append(ColumnMapping("isFemale", target_identifier="is_female", target_datatype="bool"))
+	column_mappings.append(ColumnMapping("height", target_identifier="height", target_datatype="float32"))
+	column_mappings.append(ColumnMapping("comment", target_identifier="comment"))
+	return column_mappings
+
+
+def _assert_typed_columns(df: pd.DataFrame):
+	print(df)
+	df.info()
+	assert df["person_id"].dtype == "int16", "person_id is not int16"
+	assert isinstance(df["name"].dtype, pd.CategoricalDtype), "name is not a category"
+	assert df["birth_day"].dtype == "datetime64[ns]", "birth_day is not a datetime"
+	assert df["is_female"].dtype == "bool", "is_female is not bool"
+	assert df["height"].dtype == "float32", "height is not float32"
+	assert df["comment"].tolist()[0] is None, "NA not replaced in untyped column"
+
+
+def test_target_datatype_csv():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	_assert_typed_columns(reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv"))
+	return True
+
+
+def test_target_datatype_excel():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	_assert_typed_columns(reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1'))
+	return True
+
+
+def test_target_datatype_transform():
+	df = pd.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	transformer = DataFrameTransformer(column_mappings=_get_typed_column_mappings())
+	_assert_typed_columns(transformer.transform(df))
+	assert df["ID"].dtype == "int64", "Source frame modified"
+	return True
+
+
+def test_target_datatype_bool():
+	# Text cells are not pushed down to a parser, astype(bool) would make 'False' True.
+	df = pd.DataFrame({'flag': ['False', 'TRUE', None, '0'], 'other': ['true', 'false', '1', '0']})
+	buffer = io.BytesIO()
+	df.to_excel(buffer, index=False)
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping('flag', target_identifier="flag", target_datatype='boolean'))
+	column_mappings.append(ColumnMapping('other', target_identifier="other", target_datatype='bool'))
+	transformer = DataFrameTransformer(column_mappings=column_mappings)
+	reader = TabularDataReader(column_mappings=column_mappings)
+	for converted in [transformer.transform(df), reader.read_spreadsheet(io.BytesIO(buffer.getvalue()), 0),
+					  pd.concat(reader.iter_spreadsheet(io.BytesIO(buffer.getvalue()), 0, chunksize=2))]:
+		print(converted.dtypes)
+		assert list(converted["flag"]) == [False, True, pd.NA, False], "Wrong booleans"
+		assert converted["flag"].dtype == "boolean", "Not nullable"
+		assert converted["other"].dtype == bool and list(converted["other"]) == [True, False, True, False], "Wrong booleans"
+	try:
+		transformer.transform(pd.DataFrame({'flag': ['yes'], 'other': ['1']}))
+		return False
+	except ValueError:
+		pass
+	try:
+		transformer.transform(pd.DataFrame({'flag': ['1'], 'other': [None]}))
+		return False
+	except ValueError:
+		pass
+	return True
+
+
+def test_optimize_datatypes():
+	data_settings = DataSettings(downcast_numeric=True, category_threshold=0.5)
+	reader = TabularDataReader(data_settings=data_settings)
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet2')
+	print(df)
+	df.info()
+	assert df["ID"].dtype == "int8", "ID not downcast"
+	assert isinstance(df["key"].dtype, pd.CategoricalDtype), "key not a category"
+	assert df["value"].dtype == object, "value is a category"
+	return True
+
+
+def test_dtype_backend_numpy_nullable():
+	reader = TabularDataReader(data_settings=DataSettings(dtype_backend='numpy_nullable'))
+	df = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	print(df)
+	df.info()
+	assert df["ID"].dtype == "Int64", "ID is not Int64"
+	assert df["height"].dtype == "Float64", "height is not Float64"
+	assert df["comment"].dtype == "string", "comment is not string"
+	records = reader.get_transformer().to_records(df)
+	print(records)
+	assert records[0]["comment"] is None, "NA not replaced with None in records"
+	return True
+
+
+def test_dtype_backend_transform():
+	df = pd.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	transformer = DataFrameTransformer(data_settings=DataSettings(dtype_backend='numpy_nullable'))
+	df = transformer.transform(df)
+	df.info()
+	assert df["isFemale"].dtype == "boolean", "isFemale is not boolean"
+	assert df["comment"].isna().sum() == 2, "NA values replaced in frame"
+	assert DataFrameTransformer.to_list_of_dict(df, replace_na_with_none=True)[1]["comment"] is None, "NA not replaced"
+	return True
+
+
+def _count_copies(df: pd.DataFrame, transformed: pd.DataFrame) -> int:
+	# Columns of transformed that do not share memory with any column of df.
+	sources = [df.iloc[:, i].to_numpy() for i in range(df.shape[1])]
+	return sum(not any(np.shares_memory(transformed.iloc[:, i].to_numpy(), x) for x in sources)
+			   for i in range(transformed.shape[1]))
+
+
+def test_transform_copies():
+	df = pd.DataFrame({'ID': [1, 2, 3], 'Name': ['a', 'b', 'c'], 'height': [1.5, 2.5, 3.5], 'other': [0, 0, 0]})
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping('ID', target_identifier="id"))
+	column_mappings.append(ColumnMapping('Name', target_identifier="name"))
+	column_mappings.append(ColumnMapping('height', target_identifier="height"))
+	transformer = DataFrameTransformer(column_mappings=column_mappings)
+	transformed = transformer.transform(df)
+	print(transformed)
+	assert list(transformed.columns) == ['id', 'name', 'height'], "Columns not renamed and selected"
+	assert _count_copies(df, transformed) == 0, "Renamed and selected columns copied"
+	assert list(df.columns) == ['ID', 'Name', 'height', 'other'], "Source frame modified"
+
+	# Only the float column holding NaN is replaced, the owned object column is changed in place.
+	df = pd.DataFrame({'ID': [1, 2, 3], 'Name': ['a', np.nan, 'c'], 'height': [1.5, np.nan, 3.5]})
+	transformed = DataFrameTransformer().transform(df, owned=True)
+	assert _count_copies(df, transformed) == 1, "Not exactly one column copied"
+	assert transformed['Name'][1] is None and transformed['height'][1] is None, "NA not replaced with None"
+	return True
+
+
+def test_sniff_csv():
+	reader = TabularDataReader(file_settings=FileSettings(auto_detect=True))
+	expected = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	for table_file, separator, header in [("sample02.csv", '|', 0), ("sample05.csv", ',', 1)]:
+		file_settings = reader.get_file_settings(f"{TEST_DATA_DIRECTORY}/{table_file}")
+		pprint(vars(file_settings))
+		assert (file_settings.separator, file_settings.header) == (separator, header), "Wrong layout sniffed"
+		df = reader.read_csv(f"{TEST_DATA_DIRECTORY}/{table_file}")
+		assert df.equals(expected), "Sniffed read differs"
+	return True
+
+
+def test_sniff_encoding():
+	reader = TabularDataReader(file_settings=FileSettings(auto_detect=True))
+	buffer = io.BytesIO('Name;Town\n"Zoë; Jr";Växjö\n'.encode('cp1252'))
+	file_settings = reader.get_file_settings(buffer)
+	assert (file_settings.encoding, file_settings.separator) == ('cp1252', ';'), "Wrong encoding sniffed"
+	assert buffer.tell() == 0, "Buffer not rewound"
+	df = reader.read_csv(buffer)
+	print(df)
+	assert df.to_dict('records') == [{'Name': 'Zoë; Jr', 'Town': 'Växjö'}], "Wrong values"
+	buffer = io.BytesIO('1\t2\n3\t4\n'.encode('utf-8-sig'))
+	file_settings = reader.get_file_settings(buffer)
+	assert (file_settings.encoding, file_settings.separator, file_settings.header) == ('utf-8-sig', '\t', None)
+	assert reader.read_csv(buffer).values.tolist() == [[1, 2], [3, 4]], "Wrong values"
+	return True
+
+
+def test_sniff_spreadsheet():
+	reader = TabularDataReader(file_settings=FileSettings(auto_detect=True))
+	expected = TabularDataReader().read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample06.xlsx", 0)
+	print(df)
+	assert df.equals(expected), "Sniffed read differs"
+	assert pd.concat(reader.iter_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample06.xlsx", 0)).equals(expected), "Sniffed read differs"
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet2')
+	assert df.equals(TabularDataReader().read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet2')), "Sniffed read differs"
+	return True
+
+
+def test_sniff_cache():
+	sniffer = Sniffer()
+	reader = TabularDataReader(file_settings=FileSettings(auto_detect=True), sniffer=sniffer)
+	file_settings = reader.get_file_settings(f"{TEST_DATA_DIRECTORY}/sample05.csv")
+	assert len(sniffer.layouts) == 1, "Layout not cached"
+	# Same leading lines, other rows.
+	buffer = io.BytesIO(b",,,,,\nID,name,bday,isFemale,height,comment\n18,Ann,1991-03-01,TRUE,5.5,\n")
+	assert TabularDataReader(file_settings=FileSettings(auto_detect=True), sniffer=sniffer).get_file_settings(
+		buffer) is file_settings, "Layout not reused"
+	assert reader.get_file_settings(f"{TEST_DATA_DIRECTORY}/sample02.csv") is not file_settings, "Wrong layout reused"
+	assert len(sniffer.layouts) == 2, "Layout not cached"
+	# Same header, the rows after it are not UTF-8.
+	reader.read_csv(b"id;name\n1;abc\n")
+	df = reader.read_csv(b"id;name\n1;caf\xe9\n")
+	assert df["name"][0] == "caf\u00e9", "Cached encoding reused"
+	return True
+
+
+def test_sources_compressed():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	expected = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+		data = f.read()
+	archive = io.BytesIO()
+	with zipfile.ZipFile(archive, 'w') as z:
+		z.writestr('sample01.csv', data)
+	with tempfile.TemporaryDirectory() as directory:
+		# No extension, the compression is told by the magic number.
+		path = os.path.join(directory, 'sample01')
+		with open(path, 'wb') as f:
+			f.write(gzip.compress(data))
+		assert get_compression(path) == 'gzip', "Compression not inferred"
+		for source in [path, io.BytesIO(bz2.compress(data)), archive.getvalue()]:
+			df = reader.read_csv(source)
+			assert df.equals(expected), f"Wrong values for {type(source).__name__}"
+		with zipfile.ZipFile(archive) as z, z.open('sample01.csv') as member:
+			assert reader.read_csv(member).equals(expected), "Wrong values for archive member"
+		uncompressed = pd.concat(reader.iter_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv", chunksize=2))
+		assert pd.concat(reader.iter_csv(path, chunksize=2)).equals(uncompressed), "Wrong chunks"
+		sniffing_reader = TabularDataReader(file_settings=FileSettings(auto_detect=True))
+		with open(f"{TEST_DATA_DIRECTORY}/sample05.csv", 'rb') as f:
+			file_settings = sniffing_reader.get_file_settings(gzip.compress(f.read()))
+		assert (file_settings.separator, file_settings.header) == (',', 1), "Wrong layout sniffed"
+	return True
+
+
+def test_sources_buffer():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	expected = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+		data = bytearray(f.read())
+	assert reader.read_csv(memoryview(data)).equals(expected), "Wrong values for memoryview"
+	assert reader.read_csv(data).equals(expected), "Wrong values for bytearray"
+	expected = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')
+	with open(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'rb') as f:
+		data = f.read()
+	assert reader.read_spreadsheet(memoryview(data), 'sheet1').equals(expected), "Wrong values for memoryview"
+	assert pd.concat(reader.iter_spreadsheet(data, 'sheet1')).equals(expected), "Wrong chunks"
+	with open(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'rb') as f:
+		df = reader.read_spreadsheet(f.read(), 'sheet2')
+	assert df.equals(reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet2')), "Wrong values for ods"
+	return True
+
+
+def test_sources_memory_map():
+	expected = TabularDataReader(column_mappings=_get_typed_column_mappings()).read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), file_settings=FileSettings(memory_map=True))
+	assert reader.get_csv_parameters(f"{TEST_DATA_DIRECTORY}/sample01.csv")['memory_map'], "File not memory mapped"
+	assert reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv").equals(expected), "Wrong values"
+	return True
+
+
+def test_sources_paths():
+	# Home relative paths are sniffed, URLs are left to pandas.
+	expected = TabularDataReader(column_mappings=_get_typed_column_mappings()).read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+		data = f.read()
+	home = os.environ.get('HOME')
+	with tempfile.TemporaryDirectory() as directory:
+		os.environ['HOME'] = directory
+		try:
+			with open(os.path.join(directory, 'sample01'), 'wb') as f:
+				f.write(gzip.compress(data))
+			assert get_compression('~/sample01') == 'gzip', "Compression not inferred"
+			assert get_compression('file:///sample01.csv') == 'infer', "Compression not left to pandas"
+			for engine in ['c', 'pyarrow']:
+				reader = TabularDataReader(column_mappings=_get_typed_column_mappings(),
+										   file_settings=FileSettings(engine=engine, auto_detect=True))
+				assert reader.read_csv('~/sample01').equals(expected), f"Wrong values for {engine}"
+			url = 'file://' + os.path.abspath(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+			reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+			assert reader.read_csv(url).equals(expected), "Wrong values for URL"
+		finally:
+			if home is None:
+				del os.environ['HOME']
+			else:
+				os.environ['HOME'] = home
+	return True
+
+
+def test_engine_pyarrow():
+	expected = TabularDataReader(column_mappings=_get_typed_column_mappings()).read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), file_settings=FileSettings(engine='pyarrow'))
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+		data = f.read()
+	for source in [f"{TEST_DATA_DIRECTORY}/sample01.csv", data, gzip.compress(data)]:
+		df = reader.read_csv(source)
+		print(df.dtypes)
+		assert df.equals(expected), f"Wrong values for {type(source).__name__}"
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(),
+							   file_settings=FileSettings(engine='pyarrow', auto_detect=True))
+	assert reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample05.csv").equals(expected), "Sniffed read differs"
+	return True
+
+
+def test_engine_pyarrow_blank_lines():
+	# pandas does not count blank lines for the header row, Arrow's skip_rows does.
+	for data in [b'\nid,name\n1,a\n', b'\n\n"i\nd",name\n\n1,a\n2,b\n']:
+		expected = TabularDataReader().read_csv(data)
+		df = TabularDataReader(file_settings=FileSettings(engine='pyarrow')).read_csv(data)
+		print(df)
+		assert df.equals(expected), f"Engines differ for {data}"
+	return True
+
+
+def test_engine_table():
+	import pyarrow as pa
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	table = reader.read_csv_table(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	print(table.schema)
+	assert isinstance(table, pa.Table), "No table returned"
+	assert table.column_names == ["person_id", "name", "birth_day", "is_female", "height", "comment"], "Wrong columns"
+	assert table.schema.field("person_id").type == pa.int16() and table.schema.field("birth_day").type == pa.timestamp('ns')
+	assert table.column("comment").null_count == 2, "Missing values not null"
+	# Renaming and selecting keep the parsed buffers.
+	source = pa.table({'ID': [1, 2], 'other': [3, 4], 'name': ['a', 'b']})
+	transformed = DataFrameTransformer(
+		[ColumnMapping("ID", target_identifier="person_id"), ColumnMapping("name", target_identifier="person_name")]
+	).transform_table(source)
+	assert transformed.column_names == ["person_id", "person_name"], "Wrong columns"
+	assert transformed.column(0).chunk(0).buffers()[1].address == source.column(0).chunk(0).buffers()[1].address
+	return True
+
+
+def test_sink_formats():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	expected = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	with tempfile.TemporaryDirectory() as directory:
+		for extension in ['parquet', 'feather', 'csv', 'jsonl']:
+			path = os.path.join(directory, f"out.{extension}")
+			summary = reader.read_csv_into(f"{TEST_DATA_DIRECTORY}/sample01.csv", path)
+			pprint(summary)
+			assert summary['rows_written'] == 3 and summary['bytes_written'] == os.path.getsize(path), "Wrong summary"
+			assert summary['rows_per_second'] > 0, "Throughput missing"
+			if extension == 'parquet':
+				assert pd.read_parquet(path).equals(expected), "Wrong values"
+			elif extension == 'feather':
+				assert pd.read_feather(path).equals(expected), "Wrong values"
+			elif extension == 'csv':
+				assert pd.read_csv(path).columns.tolist() == expected.columns.tolist(), "Wrong header"
+			else:
+				with open(path) as f:
+					lines = [json.loads(x) for x in f]
+				assert lines[2]['comment'] == 'nice, and small' and lines[0]['comment'] is None, "Wrong values"
+
+	class IncompleteSink(Sink):
+		pass
+
+	try:
+		IncompleteSink(io.BytesIO())
+		return False
+	except TypeError:
+		pass
+	return True
+
+
+def test_sink_parquet():
+	import pyarrow as pa
+	import pyarrow.parquet as pq
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	buffer = io.BytesIO()
+	# The comment column is empty in the first chunk, so its type can not be taken from it.
+	try:
+		with ParquetSink(buffer) as sink:
+			reader.read_csv_into(f"{TEST_DATA_DIRECTORY}/sample01.csv", sink, chunksize=2)
+		assert False, "Schema mismatch not raised"
+	except ValueError as e:
+		print(e)
+	schema = pa.Table.from_pandas(reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv"), preserve_index=False).schema
+	buffer = io.BytesIO()
+	with ParquetSink(buffer, schema=schema) as sink:
+		summary = reader.read_csv_into(f"{TEST_DATA_DIRECTORY}/sample01.csv", sink, chunksize=2)
+		assert (summary['rows_written'], summary['chunks_written']) == (3, 2), "Wrong summary"
+		summary = reader.read_spreadsheet_into(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", sink, 'sheet1', chunksize=2)
+		assert (summary['rows_written'], summary['chunks_written']) == (3, 2), "Summary not per read"
+	assert not buffer.closed, "Buffer closed"
+	parquet_file = pq.ParquetFile(io.BytesIO(buffer.getvalue()))
+	assert parquet_file.num_row_groups == 4 and parquet_file.metadata.num_rows == 6, "Not a row group per chunk"
+	return True
+
+
+def test_row_filters_csv():
+	expected = TabularDataReader(column_mappings=_get_typed_column_mappings()).read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	for row_filters, index in [
+		([("birth_day", ">=", "1988-01-01")], [0, 2]),
+		([("name", "in", ["Bob", "Maria"]), ("is_female", "==", True)], [2]),
+		([lambda df: df["height"] > 5.5], [0, 1]),
+		([("comment", "!=", "x")], [0, 1, 2]),
+	]:
+		reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), row_filters=row_filters)
+		df = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+		print(df)
+		assert df.index.tolist() == index, "Wrong rows"
+		assert df.dtypes.equals(expected.dtypes), "Wrong datatypes"
+		assert df.drop(columns="name").equals(expected.loc[index].drop(columns="name")), "Wrong values"
+		df = pd.concat(reader.iter_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv", chunksize=2))
+		assert df.index.tolist() == index, "Wrong rows in chunks"
+		reader.file_settings = FileSettings(engine='pyarrow')
+		assert len(reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")) == len(index), "Wrong rows with pyarrow"
+		if not callable(row_filters[0]):
+			assert reader.read_csv_table(f"{TEST_DATA_DIRECTORY}/sample01.csv").num_rows == len(index), "Wrong table rows"
+	try:
+		TabularDataReader(column_mappings=_get_typed_column_mappings(), row_filters=[("ID", "==", 15)]).read_csv(
+			f"{TEST_DATA_DIRECTORY}/sample01.csv")
+		assert False, "Filter on a source column name not raised"
+	except ValueError as e:
+		print(e)
+	return True
+
+
+def test_row_filters_spreadsheet():
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), row_filters=[("person_id", "<", 17)])
+	df = reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')
+	print(df)
+	assert df["person_id"].tolist() == [15, 16], "Wrong rows"
+	assert df["comment"].tolist() == [None, None], "NA not replaced"
+	df = pd.concat(reader.iter_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample04.ods", 'sheet1', chunksize=1))
+	assert df["person_id"].tolist() == [15, 16], "Wrong rows"
+	return True
+
+
+def test_row_filters_cleared():
+	# Filters replaced or cleared between reads apply to the next read.
+	path = f"{TEST_DATA_DIRECTORY}/sample01.csv"
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), row_filters=[("person_id", "<", 17)])
+	assert len(reader.read_csv(path)) == 2, "Wrong rows"
+	for row_filters in [None, []]:
+		reader.row_filters = row_filters
+		assert len(reader.read_csv(path)) == 3, f"Filters kept after setting {row_filters}"
+		reader.row_filters = [("person_id", "==", 15)]
+		assert len(reader.read_csv(path)) == 1, "Replaced filters not applied"
+	return True
+
+
+def _append(path: str, data: bytes):
+	with open(path, 'ab') as f:
+		f.write(data)
+
+
+def _without_categories(df: pd.DataFrame) -> pd.DataFrame:
+	# Chunks only know the categories of their own rows.
+	return df.astype({x: object for x, y in df.dtypes.items() if isinstance(y, pd.CategoricalDtype)})
+
+
+def test_tail_append():
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+		lines = f.read().splitlines(keepends=True)
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	expected = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "tail.csv")
+		tail_reader = TailReader(reader, path)
+		_append(path, lines[0][:5])
+		assert len(tail_reader.poll()) == 0, "Incomplete header read"
+		_append(path, lines[0][5:] + lines[1] + lines[2][:7])
+		df = tail_reader.poll()
+		print(df)
+		assert _without_categories(df).equals(_without_categories(expected.iloc[:1])), "Wrong first rows"
+		# The quoted comment holds the separator, the cut must wait for the closing quote.
+		_append(path, lines[2][7:] + lines[3][:-5])
+		assert _without_categories(tail_reader.poll()).equals(_without_categories(expected.iloc[1:2])), "Incomplete line read"
+		_append(path, lines[3][-5:])
+		df = tail_reader.poll()
+		print(df)
+		assert _without_categories(df).equals(_without_categories(expected.iloc[2:])), "Wrong last rows"
+		assert len(tail_reader.poll()) == 0 and tail_reader.reset_reason is None, "Rows read twice"
+		_append(path, b'18,"Ann\nMarie",1991-03-01,TRUE,5.5,"say ""hi""\n')
+		assert len(tail_reader.poll()) == 0, "Line with open quote read"
+		_append(path, b'"\n')
+		df = tail_reader.poll()
+		print(df)
+		assert df.to_dict('records')[0]['comment'] == 'say "hi"\n' and df.index.tolist() == [3], "Wrong quoted row"
+	return True
+
+
+def test_tail_checkpoint():
+	with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+		lines = f.read().splitlines(keepends=True)
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings())
+	expected = reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	with tempfile.TemporaryDirectory() as directory:
+		path = os.path.join(directory, "tail.csv")
+		_append(path, b''.join(lines[:3]))
+		tail_reader = TailReader(reader, path)
+		assert len(tail_reader.poll()) == 2, "Rows missing"
+		checkpoint = json.loads(json.dumps(tail_reader.checkpoint.to_dict()))
+		_append(path, lines[3])
+		# A restart continues from the checkpoint.
+		tail_reader = TailReader(reader, path, TailCheckpoint.from_dict(checkpoint))
+		assert _without_categories(tail_reader.poll()).equals(_without_categories(expected.iloc[2:])), "Wrong rows after restart"
+		with open(path, 'wb') as f:
+			f.write(lines[0] + lines[1])
+		assert _without_categories(tail_reader.poll()).equals(_without_categories(expected.iloc[:1])) and tail_reader.reset_reason == 'truncated'
+		with open(path, 'wb') as f:
+			f.write(lines[0] + lines[2] + lines[3])
+		assert _without_categories(tail_reader.poll()).equals(_without_categories(expected.iloc[1:].reset_index(drop=True))), "Rewritten file not read again"
+		assert tail_reader.reset_reason == 'rewritten', "Rewrite not detected"
+		os.replace(path, path + ".1")
+		with open(path, 'wb') as f:
+			f.write(b''.join(lines))
+		assert _without_categories(tail_reader.poll()).equals(_without_categories(expected)) and tail_reader.reset_reason == 'rotated', "Rotation not detected"
+	return True
+
+
+class _AsyncStream:
+	def __init__(self, data: bytes, block_size: int):
+		self.data = data
+		self.block_size = block_size
+
+	async def read(self, size: int = -1) -> bytes:
+		await asyncio.sleep(0)
+		size = self.block_size if size < 0 else min(size, self.block_size)
+		block, self.data = self.data[:size], self.data[size:]
+		return block
+
+
+def test_async_read():
+	async def read():
+		expected = TabularDataReader().read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+		with open(f"{TEST_DATA_DIRECTORY}/sample01.csv", 'rb') as f:
+			data = f.read()
+		async with AsyncTabularDataReader(TabularDataReader(), max_concurrency=2) as reader:
+			frames = await asyncio.gather(reader.aread_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv"),
+										  reader.aread_csv(data), reader.aread_csv(_AsyncStream(data, 16)))
+			for df in frames:
+				assert df.equals(expected), "Async read differs"
+			df = await reader.aread_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1')
+			print(df)
+			assert df.equals(TabularDataReader().read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1'))
+			assert reader.semaphore._value == 2, "Concurrency slots not released"
+	asyncio.run(read())
+	return True
+
+
+def test_async_concurrency():
+	# Reads with many headers share the plan and layout caches, which are evicted all the time.
+	async def read():
+		sources = [f"a{i};b{i}\n{i};x\n".encode() for i in range(50)] * 20
+		reader = TabularDataReader(file_settings=FileSettings(auto_detect=True), sniffer=Sniffer(cache_size=2))
+		reader.get_transformer().plan_cache_size = 2
+		async with AsyncTabularDataReader(reader, max_concurrency=8) as async_reader:
+			frames = await asyncio.gather(*[async_reader.aread_csv(x) for x in sources])
+		for i, df in enumerate(frames):
+			assert list(df.columns) == [f"a{i % 50}", f"b{i % 50}"] and df.iloc[0, 0] == i % 50, f"Read {i} differs"
+		assert len(reader.sniffer.layouts) <= 2 and len(reader.transformer.plan_cache) <= 2, "Caches exceed their size"
+	switch_interval = sys.getswitchinterval()
+	sys.setswitchinterval(1e-6)
+	try:
+		asyncio.run(read())
+	finally:
+		sys.setswitchinterval(switch_interval)
+	return True
+
+
+def test_async_iter():
+	async def read():
+		data = pd.DataFrame({"a": range(1000), "b": [x / 2 for x in range(1000)]}).to_csv(index=False).encode()
+		async with AsyncTabularDataReader(TabularDataReader()) as reader:
+			chunks = [x async for x in reader.aiter_csv(_AsyncStream(data, 256), chunksize=100)]
+			assert len(chunks) == 10, "Not read in chunks"
+			assert pd.concat(chunks).equals(pd.read_csv(io.BytesIO(data))), "Chunks differ"
+			# Stops the parser once the consumer leaves.
+			chunks = reader.aiter_csv(data, chunksize=10, queue_size=1)
+			async for chunk in chunks:
+				assert len(chunk) == 10, "Wrong chunk size"
+				break
+			await chunks.aclose()
+			for _ in range(100):
+				if reader.semaphore._value == reader.max_concurrency:
+					break
+				await asyncio.sleep(0.01)
+			assert reader.semaphore._value == reader.max_concurrency, "Parser not stopped"
+	asyncio.run(read())
+	return True
+
+
+def test_stats_csv():
+	records = list[dict]()
+	stats = ReadStats(callbacks=[records.append])
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), stats=stats)
+	reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+	pprint(records)
+	assert [x['stage'] for x in records] == ['plan', 'parse', 'select', 'convert', 'replace_na'], "Stages missing"
+	assert all(x['source'] == f"{TEST_DATA_DIRECTORY}/sample01.csv" for x in records), "Wrong source"
+	assert records[1]['rows'] == 3 and records[1]['bytes_read'] > 0, "Parse not recorded"
+	assert all(x['seconds'] >= 0 for x in records), "Time not recorded"
+	list(reader.iter_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv", chunksize=2))
+	summary = stats.get_summary()
+	pprint(summary)
+	assert summary['parse']['count'] == 3 and summary['parse']['rows'] == 6, "Chunks not recorded"
+	assert list(stats.records) == records, "Records not kept"
+	return True
+
+
+def test_stats_spreadsheet():
+	stats = ReadStats(max_records=100)
+	reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), stats=stats)
+	reader.read_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", None)
+	list(reader.iter_spreadsheet(f"{TEST_DATA_DIRECTORY}/sample03.xlsx", 'sheet1', chunksize=2))
+	records = [x for x in stats.records if x['stage'] == 'parse']
+	pprint(records)
+	assert [(x['sheet_name'], x['rows']) for x in records] == [('sheet1', 3), ('sheet2', 5), ('sheet1', 2), ('sheet1', 1)]
+	assert all(x['source'] == f"{TEST_DATA_DIRECTORY}/sample03.xlsx" for x in stats.records), "Wrong source"
+	return True
+
+
+def test_read_many():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(source_identifier_contains('ID'), target_identifier="person_id"))
+	column_mappings.append(ColumnMapping("name", target_identifier="person_name"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	paths = [f"{TEST_DATA_DIRECTORY}/sample01.csv", f"{TEST_DATA_DIRECTORY}/sample03.xlsx",
+			 f"{TEST_DATA_DIRECTORY}/sample04.ods", f"{TEST_DATA_DIRECTORY}/missing.csv"]
+	errors = dict()
+	frames = reader.read_many(paths, workers=2, errors=errors)
+	pprint(frames)
+	assert list(frames.keys()) == paths[:3], "Frames not in input order"
+	assert list(errors.keys()) == paths[3:], "Error not collected"
+	df = reader.read_many(paths[:3], workers=2, concat=True)
+	print(df)
+	assert len(df) == 9, "Frames not concatenated"
+	assert list(df.columns) == ["person_id", "person_name"], "Frames not transformed"
+	return True
+
+
+def test_workbook_lazy():
+	reader = TabularDataReader()
+	for path in (f"{TEST_DATA_DIRECTORY}/sample03.xlsx", f"{TEST_DATA_DIRECTORY}/sample04.ods"):
+		with Workbook(reader, path) as workbook:
+			print(workbook.sheet_names, [workbook.get_dimensions(x) for x in workbook.sheet_names])
+			assert workbook.sheet_names == ['sheet1', 'sheet2'], "Sheet names not listed"
+			assert workbook.get_dimensions('sheet1') == (4, 6), "Dimensions not read"
+			assert not workbook.frames, "Sheets parsed before access"
+			df = workbook[1]
+			assert list(workbook.frames) == ['sheet2'], "Other sheets parsed"
+			assert workbook['sheet2'] is df, "Sheet parsed again"
+			pd.testing.assert_frame_equal(df, reader.read_spreadsheet(path, 'sheet2'))
+			try:
+				workbook['missing']
+				return False
+			except ValueError:
+				pass
+	return True
+
+
+def test_workbook_parallel():
+	column_mappings = list[ColumnMapping]()
+	column_mappings.append(ColumnMapping(source_identifier_contains('ID'), target_identifier="person_id"))
+	reader = TabularDataReader(column_mappings=column_mappings)
+	path = f"{TEST_DATA_DIRECTORY}/sample03.xlsx"
+	with Workbook(reader, path) as workbook:
+		frames = workbook.read([1, 'sheet1'], workers=2)
+		pprint(frames)
+		assert list(frames) == [1, 'sheet1'], "Frames not in requested order"
+		expected = reader.read_spreadsheet(path, None)
+		for x in ('sheet1', 'sheet2'):
+			pd.testing.assert_frame_equal(workbook[x], expected[x])
+	return True
+
+
+def test_cache_csv():
+	with tempfile.TemporaryDirectory() as directory:
+		reader = TabularDataReader(column_mappings=_get_typed_column_mappings(), cache=ReadCache(directory))
+		path = f"{TEST_DATA_DIRECTORY}/sample01.csv"
+		df = reader.read_csv(path)
+		entries = reader.cache.get_entries()
+		assert len(entries) == 1, "Frame not cached"
+		# A hit touches the entry's manifest.
+		os.utime(os.path.join(directory, entries[0][0], MANIFEST_FILE_NAME), (0, 0))
+		cached = reader.read_csv(path)
+		assert reader.cache.get_entries()[0][1] > 0, "Cache missed"
+		_assert_typed_columns(cached)
+		assert cached.equals(df), "Cached frame differs"
+		assert len(reader.cache.get_entries()) == 1, "Frame cached twice"
+		# URLs are read but not cached.
+		assert reader.read_csv('file://' + os.path.abspath(path)).equals(df), "Wrong values for URL"
+		assert len(reader.cache.get_entries()) == 1, "URL cached"
+	return True
+
+
+def test_cache_spreadsheet():
+	with tempfile.TemporaryDirectory() as directory:
+		reader = TabularDataReader(cache=ReadCache(directory, hash_content=True))
+		path = f"{TEST_DATA_DIRECTORY}/sample04.ods"
+		spreadsheet = reader.read_spreadsheet(path)
+		cached = reader.read_spreadsheet(path)
+		pprint(cached)
+		assert list(cached.keys()) == list(spreadsheet.keys()), "Cached sheets differ"
+		for sheet_name, sheet in spreadsheet.items():
+			assert cached[sheet_name].equals(sheet), f"Cached sheet {sheet_name} differs"
+		reader.read_spreadsheet(path, 0)
+		assert len(reader.cache.get_entries()) == 2, "Sheet selection not part of the key"
+	return True
+
+
+def test_cache_callables():
+	# Lambdas and closures share their qualified name.
+	def equals(flag: bool):
+		return lambda x, y: (x == y) == flag
+
+	with tempfile.TemporaryDirectory() as directory:
+		cache = ReadCache(directory)
+		path = f"{TEST_DATA_DIRECTORY}/sample01.csv"
+		expected = TabularDataReader().read_csv(path)
+		for i, source_identifier in enumerate([(lambda x, y: x == y, 'ID'), (lambda x, y: x != y, 'ID'),
+											   (equals(True), 'ID'), (equals(False), 'ID')]):
+			reader = TabularDataReader(column_mappings=[ColumnMapping(source_identifier, target_identifier="t")],
+									   cache=cache)
+			df = reader.read_csv(path)
+			assert list(df["t"]) == list(expected["ID" if i % 2 == 0 else "name"]), f"Wrong frame for mapping {i}"
+			assert len(cache.get_entries()) == i + 1, f"Mapping {i} shares a key"
+	return True
+
+
+def test_cache_eviction():
+	with tempfile.TemporaryDirectory() as directory:
+		reader = TabularDataReader(cache=ReadCache(directory, max_bytes=1))
+		reader.read_csv(f"{TEST_DATA_DIRECTORY}/sample01.csv")
+		assert len(reader.cache.get_entries()) == 0, "Cache exceeds its size"
+	return True
+
+
 def test_read_header(header, file_type, table_file):
 	file_settings = FileSettings()
 	if header != 'default':
@@ -315,9 +1358,103 @@ def test_read_header_1_excel():
 	return test_read_header(1, 'excel', table_file)
 
 
+def _print_bench_results(results: list[dict]):
+	lines = [json.dumps(x) for x in results]
+	print('\n'.join(lines))
+	# Set STRAW_BENCH_OUTPUT to keep the results for python -m straw.bench compare.
+	if os.environ.get('STRAW_BENCH_OUTPUT'):
+		with open(os.environ['STRAW_BENCH_OUTPUT'], 'a') as f:
+			f.write('\n'.join(lines) + '\n')
+
+
+def test_bench_smoke():
+	shapes = [bench.BenchShape('smoke', 200, columns=12, mappings=6, file_types=('csv', 'xlsx', 'ods'))]
+	results = bench.run_suite(shapes, repeat=1)
+	_print_bench_results(results)
+	assert [x['case'] for x in results] == ['read_csv', 'read_csv_pyarrow', 'read_spreadsheet', 'read_spreadsheet',
+											'transform', 'to_list_of_dict', 'get_schema'], "Cases missing"
+	assert all(x['rows'] == 200 and x['rows_per_second'] > 0 and x['peak_rss_bytes'] != 0 for x in results)
+	return True
+
+
+def test_bench_compare():
+	baseline = [{'case': 'read_csv', 'shape': 'long', 'file_type': 'csv', 'seconds': 1.0, 'rss_delta_bytes': 100}]
+	current = [{'case': 'read_csv', 'shape': 'long', 'file_type': 'csv', 'seconds': 1.5, 'rss_delta_bytes': 100},
+			   {'case': 'get_schema', 'shape': 'long', 'file_type': None, 'seconds': 1.0, 'rss_delta_bytes': 0}]
+	comparison = bench.compare(baseline, current)
+	pprint(comparison)
+	assert len(comparison) == 1 and comparison[0]['regression'], "Regression not found"
+	assert not bench.compare(baseline, baseline)[0]['regression'], "Regression found"
+	return True
+
+
 def get_test_cases() -> dict[str, dict | Callable]:
 	return {
+		"bench": {
+			"smoke": test_bench_smoke,
+			"compare": test_bench_compare
+		},
 		"reader": {
+			"read_many": test_read_many,
+			"workbook": {
+				"lazy": test_workbook_lazy,
+				"parallel": test_workbook_parallel
+			},
+			"stats": {
+				"csv": test_stats_csv,
+				"spreadsheet": test_stats_spreadsheet
+			},
+			"async": {
+				"read": test_async_read,
+				"iter": test_async_iter,
+				"concurrency": test_async_concurrency
+			},
+			"tail": {
+				"append": test_tail_append,
+				"checkpoint": test_tail_checkpoint
+			},
+			"row_filters": {
+				"csv": test_row_filters_csv,
+				"spreadsheet": test_row_filters_spreadsheet,
+				"cleared": test_row_filters_cleared
+			},
+			"sink": {
+				"formats": test_sink_formats,
+				"parquet": test_sink_parquet
+			},
+			"engine": {
+				"pyarrow": test_engine_pyarrow,
+				"blank_lines": test_engine_pyarrow_blank_lines,
+				"table": test_engine_table
+			},
+			"sources": {
+				"compressed": test_sources_compressed,
+				"buffer": test_sources_buffer,
+				"memory_map": test_sources_memory_map,
+				"paths": test_sources_paths
+			},
+			"sniff": {
+				"csv": test_sniff_csv,
+				"encoding": test_sniff_encoding,
+				"spreadsheet": test_sniff_spreadsheet,
+				"cache": test_sniff_cache
+			},
+			"cache": {
+				"csv": test_cache_csv,
+				"spreadsheet": test_cache_spreadsheet,
+				"callables": test_cache_callables,
+				"eviction": test_cache_eviction
+			},
+			"iter": {
+				"csv": test_iter_csv,
+				"spreadsheet": {
+					"xlsx": test_iter_spreadsheet_xlsx,
+					"header": test_iter_spreadsheet_xlsx_header,
+					"no_header": test_iter_spreadsheet_xlsx_no_header,
+					"projection": test_iter_spreadsheet_xlsx_projection,
+					"ods": test_iter_spreadsheet_ods
+				}
+			},
 			"read": {
 				"csv": test_read_csv,
 				"pipe_sep_file": test_read_csv_pipe_separated,
@@ -334,6 +1471,7 @@ def get_test_cases() -> dict[str, dict | Callable]:
 				"spreadsheet": {
 					"excel": {
 						"xlsx": test_read_spreadsheet_excel,
+						"wide_rows": test_read_spreadsheet_excel_wide_rows,
 						"one_sheet": {
 							"by_position": test_read_spreadsheet_excel_one_sheet_by_position,
 							"by_name": test_read_spreadsheet_excel_one_sheet_by_name,
@@ -345,6 +1483,9 @@ def get_test_cases() -> dict[str, dict | Callable]:
 					},
 					"ods": {
 						"all_sheets": test_read_spreadsheet_ods,
+						"native": test_read_spreadsheet_ods_native,
+						"projection": test_read_spreadsheet_ods_projection,
+						"wide_rows": test_read_spreadsheet_ods_wide_rows,
 						"one_sheet": {
 							"by_position": test_read_spreadsheet_ods_one_sheet_by_position,
 							"by_name": test_read_spreadsheet_ods_one_sheet_by_name,
@@ -365,14 +1506,42 @@ def get_test_cases() -> dict[str, dict | Callable]:
 						"source_identifier_functions": test_read_transform_rename_source_identifier_functions,
 						"not_case_sensitive": test_read_transform_rename_not_case_sensitive,
 						"case_sensitive": test_read_transform_rename_case_sensitive,
+						"column_index": test_read_transform_rename_column_index,
+					},
+					"target_datatype": {
+						"csv": test_target_datatype_csv,
+						"excel": test_target_datatype_excel,
+						"transform": test_target_datatype_transform,
+						"bool": test_target_datatype_bool,
+						"optimize": test_optimize_datatypes
+					},
+					"dtype_backend": {
+						"numpy_nullable": test_dtype_backend_numpy_nullable,
+						"transform": test_dtype_backend_transform
+					},
+					"copies": test_transform_copies,
+					"plan_cache": {
+						"reuse": test_plan_cache,
+						"eviction": test_plan_cache_eviction,
+						"changes": test_plan_cache_changes
 					},
 					"to_list_of_dict": test_to_list_of_dict,
-					"get_schema": test_get_schema,
+					"iter_records": test_iter_records,
+					"to_columns": test_to_columns,
+					"get_schema": {
+						"frame": test_get_schema,
+						"sample": test_get_schema_sample,
+						"header": test_get_schema_header
+					},
 					"remove_unwanted_columns": {
 						"default": test_remove_unwanted_columns_default,
 						"True": test_remove_unwanted_columns_true,
 						"False": test_remove_unwanted_columns_false,
-						"no_column_mapping": test_remove_unwanted_columns_no_column_mapping
+						"no_column_mapping": test_remove_unwanted_columns_no_column_mapping,
+						"push_down": {
+							"csv": test_column_push_down_csv,
+							"spreadsheet": test_column_push_down_spreadsheet
+						}
 					}
 				}
 			}
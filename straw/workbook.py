@@ -0,0 +1,108 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from straw.ods_reader import OdsReader, is_ods
+from straw.reader import TabularDataReader
+from straw.sources import get_source
+from straw.xlsx_reader import XlsxReader, is_xlsx
+
+
+def _read_sheet(reader: TabularDataReader, path, sheet_name: str) -> pd.DataFrame:
+	return reader.read_spreadsheet(path, sheet_name)
+
+
+class Workbook:
+	# A spreadsheet opened once. Sheet names and dimensions are read without parsing cells, a sheet is parsed and
+	# transformed on first access and kept. Results are the same as read_spreadsheet's.
+	def __init__(self, reader: TabularDataReader, io):
+		self.reader = reader
+		self.io = get_source(io)
+		self.frames = dict[str, pd.DataFrame]()
+		self.dimensions = dict[str, tuple[int, int] | None]()
+		# ODS is parsed natively unless the header spans rows, xlsx only streams names and dimensions, cells are
+		# parsed by pandas like read_spreadsheet does. Other formats have no streaming reader.
+		self.ods_reader: OdsReader | None = None
+		self.xlsx_reader: XlsxReader | None = None
+		if not isinstance(reader.file_settings.header, list) and is_ods(self.io):
+			self.ods_reader = OdsReader(self.io)
+		elif is_xlsx(self.io):
+			self.xlsx_reader = XlsxReader(self.io)
+		self._excel_file: pd.ExcelFile | None = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		for x in (self.ods_reader, self.xlsx_reader, self._excel_file):
+			if x is not None:
+				x.close()
+
+	@property
+	def excel_file(self) -> pd.ExcelFile:
+		# Opened on the first sheet pandas parses, then shared by all of them.
+		if self._excel_file is None:
+			self._excel_file = pd.ExcelFile(self.io)
+		return self._excel_file
+
+	@property
+	def sheet_names(self) -> list[str]:
+		if self.ods_reader is not None:
+			return self.ods_reader.sheet_names
+		if self.xlsx_reader is not None:
+			return self.xlsx_reader.sheet_names
+		return self.excel_file.sheet_names
+
+	def get_sheet_name(self, sheet_name: str | int) -> str:
+		sheet_names = self.sheet_names
+		if isinstance(sheet_name, int):
+			if not -len(sheet_names) <= sheet_name < len(sheet_names):
+				raise IndexError(f"Worksheet index {sheet_name} is invalid, {len(sheet_names)} worksheets found")
+			return sheet_names[sheet_name]
+		if sheet_name not in sheet_names:
+			raise ValueError(f"Worksheet named '{sheet_name}' not found")
+		return sheet_name
+
+	def get_dimensions(self, sheet_name: str | int = 0) -> tuple[int, int] | None:
+		# Rows and columns including the header, None when the format does not record them. xlsx takes them from
+		# the <dimension> element, ODS from a pass over the rows that converts no cells.
+		sheet_name = self.get_sheet_name(sheet_name)
+		if sheet_name not in self.dimensions:
+			dimensions = None
+			if self.ods_reader is not None:
+				dimensions = self.ods_reader.get_dimensions(sheet_name)
+			elif self.xlsx_reader is not None:
+				dimensions = self.xlsx_reader.get_dimensions(sheet_name)
+			self.dimensions[sheet_name] = dimensions
+		return self.dimensions[sheet_name]
+
+	def __getitem__(self, sheet_name: str | int) -> pd.DataFrame:
+		sheet_name = self.get_sheet_name(sheet_name)
+		if sheet_name not in self.frames:
+			self.frames[sheet_name] = self.reader.read_sheet(
+				self.ods_reader if self.ods_reader is not None else self.excel_file, sheet_name)
+		return self.frames[sheet_name]
+
+	def read(
+			self, sheet_names: list[str | int] | None = None, workers: int | None = 1
+	) -> dict[str | int, pd.DataFrame]:
+		# All sheets when sheet_names is None. With more than one worker the sheets not parsed yet are read in a
+		# process pool, each worker opens the file itself, so only a path can be shared with them.
+		if sheet_names is None:
+			sheet_names = self.sheet_names
+		names = {x: self.get_sheet_name(x) for x in sheet_names}
+		missing = list(dict.fromkeys(x for x in names.values() if x not in self.frames))
+		if workers != 1 and len(missing) > 1 and isinstance(self.io, (str, os.PathLike)):
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				futures = {executor.submit(_read_sheet, self.reader, self.io, x): x for x in missing}
+				for future in as_completed(futures):
+					try:
+						self.frames[futures[future]] = future.result()
+					except Exception:
+						executor.shutdown(cancel_futures=True)
+						raise
+		return {x: self[name] for x, name in names.items()}
@@ -0,0 +1,212 @@
+import datetime
+import posixpath
+import re
+import zipfile
+from typing import Container, Iterator
+from xml.etree.ElementTree import iterparse
+
+RELATIONSHIPS_NAMESPACE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+BUILTIN_DATE_FORMAT_IDS = set(range(14, 23)) | set(range(27, 37)) | set(range(45, 48)) | set(range(50, 59))
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+EXCEL_1904_EPOCH = datetime.datetime(1904, 1, 1)
+
+
+def _local_name(tag: str) -> str:
+	return tag.rsplit('}', 1)[-1]
+
+
+def _is_date_format(format_code: str) -> bool:
+	format_code = re.sub(r'"[^"]*"|\[[^]]*]|\\.|_.|\*.', '', format_code)
+	return format_code.lower() != 'general' and re.search(r'[dmyhs]', format_code, re.IGNORECASE) is not None
+
+
+def column_index(cell_reference: str) -> int:
+	index = 0
+	for char in cell_reference:
+		if char.isdigit():
+			break
+		index = index * 26 + ord(char.upper()) - 64
+	return index - 1
+
+
+def is_xlsx(io) -> bool:
+	if isinstance(io, (bytes, bytearray, memoryview)):
+		return False
+	position = io.tell() if hasattr(io, 'tell') else None
+	try:
+		with zipfile.ZipFile(io) as archive:
+			return 'xl/workbook.xml' in archive.namelist()
+	except (zipfile.BadZipFile, OSError):
+		return False
+	finally:
+		if position is not None:
+			io.seek(position)
+
+
+class XlsxReader:
+	# Reads sheet XML incrementally, the workbook object model is never built.
+	def __init__(self, io):
+		self.archive = zipfile.ZipFile(io)
+		self.date1904 = False
+		self.sheet_paths = dict[str, str]()
+		self._shared_strings: list[str] | None = None
+		self._date_styles: set[int] | None = None
+		self._read_workbook()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.archive.close()
+
+	@property
+	def sheet_names(self) -> list[str]:
+		return list(self.sheet_paths.keys())
+
+	def _read_workbook(self):
+		targets = dict[str, str]()
+		with self.archive.open('xl/_rels/workbook.xml.rels') as f:
+			for _, elem in iterparse(f):
+				if _local_name(elem.tag) == 'Relationship':
+					target = elem.get('Target')
+					targets[elem.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+		with self.archive.open('xl/workbook.xml') as f:
+			for _, elem in iterparse(f):
+				name = _local_name(elem.tag)
+				if name == 'workbookPr':
+					self.date1904 = elem.get('date1904') in ('1', 'true')
+				elif name == 'sheet':
+					self.sheet_paths[elem.get('name')] = targets[elem.get(f'{{{RELATIONSHIPS_NAMESPACE}}}id')]
+
+	@property
+	def shared_strings(self) -> list[str]:
+		if self._shared_strings is None:
+			self._shared_strings = list[str]()
+			if 'xl/sharedStrings.xml' in self.archive.namelist():
+				with self.archive.open('xl/sharedStrings.xml') as f:
+					for _, elem in iterparse(f):
+						if _local_name(elem.tag) == 'si':
+							self._shared_strings.append(self._get_text(elem))
+							elem.clear()
+		return self._shared_strings
+
+	@staticmethod
+	def _get_text(elem) -> str:
+		# Rich text runs are concatenated, phonetic runs are left out.
+		texts = list[str]()
+		for child in elem:
+			name = _local_name(child.tag)
+			if name == 't':
+				texts.append(child.text or '')
+			elif name == 'r':
+				texts.extend(t.text or '' for t in child if _local_name(t.tag) == 't')
+		return ''.join(texts)
+
+	@property
+	def date_styles(self) -> set[int]:
+		if self._date_styles is None:
+			self._date_styles = set[int]()
+			if 'xl/styles.xml' in self.archive.namelist():
+				date_format_ids = set(BUILTIN_DATE_FORMAT_IDS)
+				with self.archive.open('xl/styles.xml') as f:
+					for _, elem in iterparse(f):
+						name = _local_name(elem.tag)
+						if name == 'numFmt' and _is_date_format(elem.get('formatCode', '')):
+							date_format_ids.add(int(elem.get('numFmtId')))
+						elif name == 'cellXfs':
+							for i, xf in enumerate(elem):
+								if int(xf.get('numFmtId', 0)) in date_format_ids:
+									self._date_styles.add(i)
+		return self._date_styles
+
+	def get_sheet_path(self, sheet_name: str | int) -> str:
+		if isinstance(sheet_name, int):
+			return list(self.sheet_paths.values())[sheet_name]
+		if sheet_name not in self.sheet_paths:
+			raise ValueError(f"Worksheet named '{sheet_name}' not found")
+		return self.sheet_paths[sheet_name]
+
+	def get_dimensions(self, sheet_name: str | int) -> tuple[int, int] | None:
+		# Reads only up to the <dimension> element at the top of the sheet.
+		with self.archive.open(self.get_sheet_path(sheet_name)) as f:
+			for _, elem in iterparse(f, events=('start',)):
+				name = _local_name(elem.tag)
+				if name == 'dimension':
+					reference = elem.get('ref', '').split(':')[-1]
+					row = re.sub(r'\D', '', reference)
+					if not row:
+						return None
+					return int(row), column_index(reference) + 1
+				if name == 'sheetData':
+					return None
+		return None
+
+	def _convert_number(self, value: str, style: str | None):
+		number = float(value)
+		if style is not None and int(style) in self.date_styles:
+			if number < 1 and not self.date1904:
+				return (datetime.datetime.min + datetime.timedelta(days=number)).time()
+			epoch = EXCEL_1904_EPOCH if self.date1904 else EXCEL_EPOCH
+			return epoch + datetime.timedelta(days=number)
+		if number.is_integer():
+			return int(number)
+		return number
+
+	def _convert_cell(self, cell):
+		cell_type = cell.get('t', 'n')
+		value = None
+		for child in cell:
+			name = _local_name(child.tag)
+			if name == 'v':
+				value = child.text
+			elif name == 'is':
+				value = self._get_text(child)
+		if value is None:
+			return None
+		if cell_type == 'n':
+			return self._convert_number(value, cell.get('s'))
+		if cell_type == 's':
+			return self.shared_strings[int(value)]
+		if cell_type == 'b':
+			return value == '1'
+		if cell_type == 'e':
+			return None
+		if cell_type == 'd':
+			return datetime.datetime.fromisoformat(value)
+		return value
+
+	def iter_rows(
+			self, sheet_name: str | int = 0, columns: Container[int] | None = None
+	) -> Iterator[tuple[int, dict[int, object]]]:
+		# Yields the 0-based row index with the non-empty cells by 0-based column index, only cells in columns
+		# are converted, the others are reported as None.
+		with self.archive.open(self.get_sheet_path(sheet_name)) as f:
+			sheet_data = None
+			row_index = -1
+			for event, elem in iterparse(f, events=('start', 'end')):
+				name = _local_name(elem.tag)
+				if event == 'start':
+					if name == 'sheetData':
+						sheet_data = elem
+					continue
+				if name != 'row':
+					continue
+				row_reference = elem.get('r')
+				row_index = int(row_reference) - 1 if row_reference else row_index + 1
+				cells = dict[int, object]()
+				cell_index = -1
+				for cell in elem:
+					cell_reference = cell.get('r')
+					cell_index = column_index(cell_reference) if cell_reference else cell_index + 1
+					if columns is None or cell_index in columns:
+						value = self._convert_cell(cell)
+						if value is not None:
+							cells[cell_index] = value
+					elif len(cell) > 0:
+						cells[cell_index] = None
+				yield row_index, cells
+				if sheet_data is not None:
+					sheet_data.clear()